@@ -11,13 +11,16 @@ __copyright__ = '(c) 2021, Copeland Carter'
 
 ################################### Imports ###################################
 import atexit
-from math import tau, pi as PI
+import linecache
+from math import ceil, tau, pi as PI
 import re
+import sys
 from ctypes import pointer, py_object
-from inspect import stack
+from os import environ
 from os.path import basename, dirname, join
 from random import randint
-from time import process_time
+from threading import Lock
+from time import perf_counter_ns
 from typing import Any, Callable, Iterable, Optional, Union
 from enum import Enum, auto
 
@@ -43,7 +46,12 @@ DISPLAY_PATH = False
 DISPLAY_FUNC = False
 DISPLAY_LINK = False
 HIDE_TODO    = False
+# Collect timeFunc and getTime times without printing anything (see timingStats() and exportTimingData())
+SILENT_TIMING = False
 # FORCE_TODO_LINK = False
+# Set COPE_DISABLE=1 in the environment before importing to compile out debug(), todo(), printContext(),
+#   and the confidence() and depricated() decorators entirely: they become stubs that cost nothing
+DISABLED = environ.get('COPE_DISABLE', '') not in ('', '0')
 
 # Default color constants
 DEFAULT_COLOR = (204, 204, 204)
@@ -108,6 +116,10 @@ def hideAllTodos(to=True):
     global HIDE_TODO
     HIDE_TODO = to
 
+def silenceTiming(to=True):
+    global SILENT_TIMING
+    SILENT_TIMING = to
+
 def setRoot(path):
     global ROOT
     ROOT = path
@@ -284,14 +296,32 @@ def dependsOnPackage(package:str, specificModules=[], _as=None,
 ################################### Debug ###################################
 varnameImported = checkImport('varname', ('ImproperUseError', 'VarnameRetrievingError', 'argname', 'nameof'), fatal=False)
 
+class _CallSite:
+    """ The parts of inspect.FrameInfo the debug functions use. Unlike inspect.stack(), this only
+        looks at the one frame it's given, and only reads the source line if it's asked for it
+        (from linecache, which only reads each file once).
+    """
+    __slots__ = ('filename', 'lineno', 'function', 'code', 'lasti')
+
+    def __init__(self, frame):
+        self.filename = frame.f_code.co_filename
+        self.lineno   = frame.f_lineno
+        self.function = frame.f_code.co_name
+        # Together, these are the exact call in the source this came from
+        self.code     = frame.f_code
+        self.lasti    = frame.f_lasti
+
+    @property
+    def code_context(self):
+        return [linecache.getline(self.filename, self.lineno)]
+
 def _debugGetMetaData(calls=1):
     """ Gets the meta data of the line you're calling this function from.
         Calls is for how many function calls to look back from.
     """
     try:
-        s = stack()[calls]
-        return s
-    except IndexError:
+        return _CallSite(sys._getframe(calls))
+    except ValueError:
         return None
 
 def _debugGetLink(calls=0, full=False, customMetaData=None):
@@ -404,7 +434,21 @@ def _debugManualGetVarName(var, full=True, calls=2, metadata=None):
     except:
         return '?'
 
+# {(code, instruction): variable name}, since the same call always has the same variable in it
+_varNameCache = {}
+
 def _debugGetVarName(var, full=True, calls=1, metadata=None):
+    """ Gets the name of the variable passed to debug(), only looking it up the first time each call runs """
+    if metadata is None:
+        return _debugLookupVarName(var, full, calls + 1, metadata)
+    key = (metadata.code, metadata.lasti)
+    try:
+        return _varNameCache[key]
+    except KeyError:
+        name = _varNameCache[key] = _debugLookupVarName(var, full, calls + 1, metadata)
+        return name
+
+def _debugLookupVarName(var, full=True, calls=1, metadata=None):
     try:
         return argname('var', frame=calls+1)
     # It's a *likely* string literal
@@ -458,7 +502,15 @@ def _debugGetContext(metadata, useVscodeStyle, showFunc, showFile, showPath):
         return ' '
 
 def _debugPrintStackTrace(calls, useVscodeStyle, showFunc, showFile, showPath):
-    for i in reversed(stack()[3:]):
+    frames = []
+    try:
+        frame = sys._getframe(3)
+    except ValueError:
+        frame = None
+    while frame is not None:
+        frames.append(_CallSite(frame))
+        frame = frame.f_back
+    for i in reversed(frames):
         print('\t', _debugGetContext(i, useVscodeStyle, showFunc, showFile, showPath))
 
 def _debugBeingUsedAsDecorator(funcName, metadata=None, calls=1) -> 'Union[1, 2, 3, False]':
@@ -742,6 +794,28 @@ def depricated(why=''):
         return innerWrap
     return wrap
 
+#* With DISABLED set, the decorators hand back the function they were given, untouched, so
+#  decorated functions are called directly, and debug() and todo() do nothing at all
+if DISABLED:
+    def _unchanged(func):
+        return func
+
+    def debug(var=None, *args, **kwargs):
+        return var
+
+    def printContext(*args, **kwargs):
+        pass
+
+    def todo(featureName=None, *args, **kwargs):
+        return featureName if callable(featureName) else _unchanged
+
+    def confidence(level):
+        return _unchanged
+    confident = confidence
+
+    def depricated(why=''):
+        return _unchanged
+
 def reprise(obj, *args, **kwargs):
     """ Sets the __repr__ function to the __str__ function of a class.
         Useful for custom classes with overloaded string functions
@@ -820,63 +894,159 @@ class LoopingList(list):
 
 
 ################################### Timing Utilities ###################################
+# The histograms have 2**_SUBBUCKET_BITS buckets for each power of 2 nanoseconds, so the percentiles
+# they give are within 1/2**(_SUBBUCKET_BITS + 1) of the real ones
+_SUBBUCKET_BITS = 3
+
+def _bucket(ns) -> "which histogram bucket ns goes in":
+    if ns < 1 << _SUBBUCKET_BITS:
+        return ns
+    shift = ns.bit_length() - _SUBBUCKET_BITS - 1
+    return ((shift + 1) << _SUBBUCKET_BITS) + (ns >> shift) - (1 << _SUBBUCKET_BITS)
+
+def _bucketMiddle(bucket) -> "the time in the middle of a histogram bucket":
+    if bucket < 1 << _SUBBUCKET_BITS:
+        return bucket
+    shift = (bucket >> _SUBBUCKET_BITS) - 1
+    start = ((bucket & ((1 << _SUBBUCKET_BITS) - 1)) + (1 << _SUBBUCKET_BITS)) << shift
+    return start + (1 << shift) // 2
+
+class _Timing:
+    """ How long all the calls to one name took, in nanoseconds. It stays the same size however many calls
+        there are: just the count, total, min and max, and a log scale histogram for the percentiles.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = {}   # {bucket: how many calls were in it}
+
+    def add(self, ns):
+        self.calls += 1
+        self.total += ns
+        self.min = ns if self.min is None else min(self.min, ns)
+        self.max = ns if self.max is None else max(self.max, ns)
+        bucket = _bucket(ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent):
+        """ Nearest rank percentile, as the middle of the bucket it's in (but never outside min and max) """
+        rank = max(1, ceil(percent / 100 * self.calls))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return max(self.min, min(self.max, _bucketMiddle(bucket)))
+        return self.max
+
+# {name: _Timing}
 timingData = {}
+_timingLock = Lock()
+_printingAtExit = False
+
+def _recordTime(name, ns):
+    """ Thread safe, so timed functions can be called from anywhere """
+    global _printingAtExit
+    with _timingLock:
+        if name not in timingData:
+            timingData[name] = _Timing()
+        timingData[name].add(ns)
+        # Only print the summary at exit if something's been timed (and we're allowed to print)
+        if not SILENT_TIMING and not _printingAtExit:
+            _printingAtExit = True
+            atexit.register(_printTimingData)
+
 def timeFunc(func, accuracy=5):
-    """ A function decorator that prints how long it takes for a function to run """
+    """ A function decorator that prints how long it takes for a function to run.
+        With silenceTiming(), it doesn't print anything, just records the time.
+    """
+    name = func.__name__
     def wrap(*params, **kwparams):
-        global timingData
-
-        t = process_time()
-
+        t = perf_counter_ns()
         returns = func(*params, **kwparams)
+        elapsed = perf_counter_ns() - t
+        _recordTime(name, elapsed)
 
-        t2 = process_time()
-
-        elapsed_time = round(t2 - t, accuracy)
-        name = func.__name__
-
-        try:
-            timingData[name] += (elapsed_time,)
-        except KeyError:
-            timingData[name] = (elapsed_time,)
-
-        _printDebugCount()
-        # print(name, ' ' * (10 - len(name)), 'took', elapsed_time if elapsed_time >= 0.00001 else 0.00000, '\ttime to run.')
-        print(f'{name:<12} took {elapsed_time:.{accuracy}f} seconds to run.')
-        #  ' ' * (15 - len(name)),
+        if not SILENT_TIMING:
+            _printDebugCount()
+            print(f'{name:<12} took {elapsed / 1e9:.{accuracy}f} seconds to run.')
         return returns
+    wrap.__name__, wrap.__doc__, wrap.__wrapped__ = name, func.__doc__, func
     return wrap
 
+def timingStats(name=None) -> "{name: {calls, total, min, mean, p50, p99, max}}, in seconds":
+    """ Summarizes the times timeFunc and getTime have recorded, for name, or everything """
+    stats = {}
+    with _timingLock:
+        for key, timing in timingData.items():
+            if (name is not None and key != name) or not timing.calls:
+                continue
+            stats[key] = {
+                'calls': timing.calls,
+                'total': timing.total / 1e9,
+                'min':   timing.min / 1e9,
+                'mean':  timing.total / timing.calls / 1e9,
+                'p50':   timing.percentile(50) / 1e9,
+                'p99':   timing.percentile(99) / 1e9,
+                'max':   timing.max / 1e9,
+            }
+    return stats
+
+def exportTimingData(path=None, format='json') -> str:
+    """ Returns timingStats() as JSON or CSV, and writes it to path, if one is given """
+    stats = timingStats()
+    if format == 'json':
+        import json
+        text = json.dumps(stats, indent=4)
+    elif format == 'csv':
+        fields = ('calls', 'total', 'min', 'mean', 'p50', 'p99', 'max')
+        text = '\n'.join(['name,' + ','.join(fields)] + [f'{name},' + ','.join(str(s[i]) for i in fields) for name, s in stats.items()]) + '\n'
+    else:
+        raise ValueError(f"Unknown format {format}, must be 'json' or 'csv'")
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+def resetTimingData():
+    with _timingLock:
+        timingData.clear()
+
 def _printTimingData(accuracy=5):
     """ I realized *after* I wrote this that this is a essentially profiler. Oops. """
-    global timingData
-    if len(timingData):
+    if SILENT_TIMING:
+        return
+    stats = timingStats()
+    if len(stats):
         print()
 
-        maxName = len(max(timingData.keys(), key=len))
-        maxNum  = len(str(len(max(timingData.values(), key=lambda x: len(str(len(x)))))))
-        for name, times in reversed(sorted(timingData.items(), key=lambda x: sum(x[1]))):
-            print(f'{name:<{maxName}} was called {len(times):<{maxNum}} times taking {sum(times)/len(times):.{accuracy}f} seconds on average for a total of {sum(times):.{accuracy}f} seconds.')
-atexit.register(_printTimingData)
+        maxName = max(len(i) for i in stats)
+        maxNum  = max(len(str(i['calls'])) for i in stats.values())
+        for name, s in sorted(stats.items(), key=lambda x: x[1]['total'], reverse=True):
+            print(f'{name:<{maxName}} was called {s["calls"]:<{maxNum}} times taking {s["mean"]:.{accuracy}f} seconds on average '
+                  f'(min {s["min"]:.{accuracy}f}, p50 {s["p50"]:.{accuracy}f}, p99 {s["p99"]:.{accuracy}f}) for a total of {s["total"]:.{accuracy}f} seconds.')
 
 class getTime:
     """ A class to use with a with statement like so:
         with getTime('sleep'):
             time.sleep(10)
         It will then print how long the enclosed code took to run.
+        With silenceTiming(), it doesn't print anything, just records the time.
     """
     def __init__(self, name, accuracy=5):
         self.name = name
         self.accuracy = accuracy
 
     def __enter__(self):
-        self.t = process_time()
+        self.t = perf_counter_ns()
 
     def __exit__(self, *args):
         # args is completely useless, not sure why it's there.
-        t2 = process_time()
-        elapsed_time = round(t2 - self.t, self.accuracy)
-        print(self.name, ' ' * (15 - len(self.name)), 'took', f'{elapsed_time:.{self.accuracy}f}', '\ttime to run.')
+        elapsed = perf_counter_ns() - self.t
+        _recordTime(self.name, elapsed)
+        if not SILENT_TIMING:
+            print(self.name, ' ' * (15 - len(self.name)), 'took', f'{elapsed / 1e9:.{self.accuracy}f}', '\ttime to run.')
 
 
 ################################### Misc. Useful Functions ###################################
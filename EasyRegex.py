@@ -188,13 +188,7 @@ __copyright__ = '(c) 2021, Copeland Carter'
 
 import re
 from enum import Enum, auto
-from random import randint, choice, choices
-try:
-    from random_word import RandomWords
-    _rw = RandomWords()
-except ImportError:
-    print("Can't import random_word (for the EasyRegex invert function). Try pip install Random-Words.")
-    _rw = None
+from functools import lru_cache
 
 
 # This and the singletons are the only things in this file that *can* be used directly
@@ -227,15 +221,28 @@ class EasyRegexFunctionCall:
             return self.perlFunc(cur, *self.args)
 
 
+# Compiled patterns are shared between every chain that renders to the same string,
+# so rebuilding a chain doesn't mean recompiling its pattern
+@lru_cache(maxsize=512)
+def _compilePattern(regex, dialect=RegexDialect.GENERIC):
+    return re.compile(regex)
+
+
 # These are mutable parts of the Regex statement, produced by EasyRegexElements. Should not be used directly.
 class EasyRegexMember:
     def __init__(self, func:EasyRegexFunctionCall):
         self.funcList = [func]
         self.dialect = RegexDialect.GENERIC
+        # The rendered string and compiled pattern, so they're only worked out once.
+        # Anything that changes the chain has to call _invalidate()
+        self._str = None
+        self._pattern = None
 
     # Magic Functions
     def __str__(self):
-        return self._compile()
+        if self._str is None:
+            self._str = self._compile()
+        return self._str
 
     def __repr__(self):
         return 'EasyRegex("' + str(self) + '")'
@@ -245,6 +252,7 @@ class EasyRegexMember:
             self.funcList.append(EasyRegexFunctionCall(lambda cur: cur + thing))
         elif type(thing) is EasyRegexMember:
             self.funcList += thing.funcList
+        self._invalidate()
         return self
 
     def __iadd__(self, thing):
@@ -255,6 +263,10 @@ class EasyRegexMember:
         NotImplementedError('The not operator is not currently implemented')
 
     # Regular functions
+    def _invalidate(self):
+        self._str = None
+        self._pattern = None
+
     def _compile(self, inverted=False):
         regex = r''
         for func in self.funcList:
@@ -262,7 +274,10 @@ class EasyRegexMember:
         return regex
 
     def compile(self):
-        return re.compile(str(self))
+        """ Returns the compiled re.Pattern. It's cached, so this is cheap to call repeatedly. """
+        if self._pattern is None:
+            self._pattern = _compilePattern(str(self), self.dialect)
+        return self._pattern
 
     def str(self):
         return str(self)
@@ -284,7 +299,7 @@ class EasyRegexMember:
         """
         print('-----------------------------------')
         print(f"Testing regex expression:\n{self}\nfor matches in:\n{testString}")
-        match = re.search(str(self), testString)
+        match = self.compile().search(testString)
         if match:
             print(f'Result: Found. Match = "{match.group()}", Span = {match.span()} ')
         else:
@@ -318,16 +333,17 @@ class EasyRegexMember:
 
     # Dialect Setters
     def usePythonDialect(self):
-        self.dialect = RegexDialect.PYTHON
+        self.setDialect(RegexDialect.PYTHON)
 
     def useGenericDialect(self):
-        self.dialect = RegexDialect.GENERIC
+        self.setDialect(RegexDialect.GENERIC)
 
     def usePerlDialect(self):
-        self.dialect = RegexDialect.PERL
+        self.setDialect(RegexDialect.PERL)
 
     def setDialect(self, dialect:RegexDialect):
         self.dialect = dialect
+        self._invalidate()
 
 
 # These are constant singletons that do not change. When called, they produce EasyRegexMembers.
@@ -335,6 +351,8 @@ class EasyRegexMember:
 class EasyRegexSingleton:
     # r'\<', r'\>', r'//'
     escapeChars = (r'\)', r'\(', r'\[', r'\]', r'\{', r'\}', r'\+', r'\*', r'\$', r'\@', r'\^', r'\:', r'\=', r'\-', r'\/')
+    # All of escapeChars (that aren't already escaped) in a single pattern, so inputs are escaped in one pass
+    _erEscape = re.compile(r'(?<!\\)(' + '|'.join(escapeChars) + ')')
 
     def __init__(self, func, invertedFunc=lambda cur, *_: cur, pythonFunc=None, perlFunc=None):
         def parseFuncParam(p):
@@ -363,9 +381,7 @@ class EasyRegexSingleton:
         if type(i) is EasyRegexMember:
             return str(i)
         elif type(i) is str:
-            for part in self.escapeChars:
-                i = re.sub(r'(?<!\\)' + part, part, i)
-            return i
+            return self._erEscape.sub(r'\\\1', i)
         else:
             raise TypeError(f'Incorrect type {type(i)} given to EasyRegex parameter: Must be string or another EasyRegex chain.')
 
@@ -386,14 +402,36 @@ _preceedOpen = '   <if preceeded by> { '
 _notPreceedOpen = '    <if not preceeded by> { '
 _optionalClose = ' }   '
 
+# random and random_word are only needed by inverse(), so they aren't imported until something gets inverted
+def _random():
+    import random
+    return random
+
+# ... means we haven't tried importing random_word yet
+_rw = ...
+def _randomWords():
+    """ The RandomWords instance, or None if random_word isn't installed. Only imported the first time it's used. """
+    global _rw
+    if _rw is ...:
+        try:
+            from random_word import RandomWords
+            _rw = RandomWords()
+        except ImportError:
+            print("Can't import random_word (for the EasyRegex invert function). Try pip install Random-Words.")
+            _rw = None
+    return _rw
+
 def _defaultInvert(s):
+    """ s is either the example string, or a function that makes one when the chain gets inverted """
+    if callable(s):
+        return lambda cur: cur + s()
     return lambda cur: cur + s
 
 def _randWord():
-    if _rw:
+    if _randomWords():
         return _rw.get_random_word()
     else:
-        return ''.join(choices(_letters + '_', k=randint(1, _alot)))
+        return ''.join(_random().choices(_letters + '_', k=_random().randint(1, _alot)))
 
 def _prevThing(cur):
     try:
@@ -428,27 +466,27 @@ add       = match
 
 # Amounts
 matchMax      = EasyRegexSingleton(lambda cur,      input='':      cur + ('' if not len(input) else r'(' + input + r')') + r'+',
-                                   lambda cur,      input='':      cur + ((_prevThing(cur) if not len(input) else input) * randint(0, _alot)))
+                                   lambda cur,      input='':      cur + ((_prevThing(cur) if not len(input) else input) * _random().randint(0, _alot)))
 matchNum      = EasyRegexSingleton(lambda cur, num, input='':      cur + ('' if not len(input) else r'(' + input + r')') + r'{' + str(num) + r'}',
                                    lambda cur, num, input='':      cur + ((_prevThing(cur) if not len(input) else input) * num))
 matchRange    = EasyRegexSingleton(lambda cur, min, max, input='': cur + ('' if not len(input) else r'(' + input + r')') + r'{' + str(min) + r',' + str(max) + r'}',
-                                   lambda cur, min, max, input='': cur + ((_prevThing(cur) if not len(input) else input) * randint(min, max)))
+                                   lambda cur, min, max, input='': cur + ((_prevThing(cur) if not len(input) else input) * _random().randint(min, max)))
 matchMoreThan = EasyRegexSingleton(lambda cur, min, input='':      cur + ('' if not len(input) else r'(' + input + r')') + r'{' + str(min - 1) + r',}',
-                                   lambda cur, min, input='':      cur + ((_prevThing(cur) if not len(input) else input) * randint(min - 1, _alot + min - 1)))
+                                   lambda cur, min, input='':      cur + ((_prevThing(cur) if not len(input) else input) * _random().randint(min - 1, _alot + min - 1)))
 matchAtLeast  = EasyRegexSingleton(lambda cur, min, input='':      cur + ('' if not len(input) else r'(' + input + r')') + r'{' + str(min) + r',}',
-                                   lambda cur, min, input='':      cur + ((_prevThing(cur) if not len(input) else input) * randint(min, _alot + min)))
+                                   lambda cur, min, input='':      cur + ((_prevThing(cur) if not len(input) else input) * _random().randint(min, _alot + min)))
 
 # Single Characters
 whitespace = EasyRegexSingleton(r'\s',  _defaultInvert(_whitespace))
-whitechunk = EasyRegexSingleton(r'\s+', _defaultInvert(_whitespace * randint(1, _alot)))
-digit      = EasyRegexSingleton(r'\d',  _defaultInvert(choice(_digits)))
-number     = EasyRegexSingleton(r'\d+', _defaultInvert(''.join(choices(_digits, k=randint(1, _alot)))))
-word       = EasyRegexSingleton(r'\w+', _defaultInvert(_randWord()))
-wordChar   = EasyRegexSingleton(r'\w',  _defaultInvert(choice(_letters + '_')))
-hexDigit   = EasyRegexSingleton(r'\x',  _defaultInvert(choice(_digits + 'ABCDEF')))
-octDigit   = EasyRegexSingleton(r'\O',  _defaultInvert(choice(_digits[:8])))
-anything   = EasyRegexSingleton(r'.',   _defaultInvert(choice(_everything)))
-chunk      = EasyRegexSingleton(r'.+',  _defaultInvert(''.join(choices(_everything, k=randint(1, _alot)))))
+whitechunk = EasyRegexSingleton(r'\s+', _defaultInvert(lambda: _whitespace * _random().randint(1, _alot)))
+digit      = EasyRegexSingleton(r'\d',  _defaultInvert(lambda: _random().choice(_digits)))
+number     = EasyRegexSingleton(r'\d+', _defaultInvert(lambda: ''.join(_random().choices(_digits, k=_random().randint(1, _alot)))))
+word       = EasyRegexSingleton(r'\w+', _defaultInvert(_randWord))
+wordChar   = EasyRegexSingleton(r'\w',  _defaultInvert(lambda: _random().choice(_letters + '_')))
+hexDigit   = EasyRegexSingleton(r'\x',  _defaultInvert(lambda: _random().choice(_digits + 'ABCDEF')))
+octDigit   = EasyRegexSingleton(r'\O',  _defaultInvert(lambda: _random().choice(_digits[:8])))
+anything   = EasyRegexSingleton(r'.',   _defaultInvert(lambda: _random().choice(_everything)))
+chunk      = EasyRegexSingleton(r'.+',  _defaultInvert(lambda: ''.join(_random().choices(_everything, k=_random().randint(1, _alot)))))
 stuff      = chunk
 
 # Explicit Characters
@@ -457,22 +495,22 @@ newLine        = EasyRegexSingleton(r'\n',     _defaultInvert('\n'))
 carriageReturn = EasyRegexSingleton(r'\r',     _defaultInvert('\r'))
 tab            = EasyRegexSingleton(r'\t',     _defaultInvert('\t'))
 space          = EasyRegexSingleton(r' ',      _defaultInvert(' '))
-quote          = EasyRegexSingleton(r'(\'|")', _defaultInvert(choice('\'"')))
+quote          = EasyRegexSingleton(r'(\'|")', _defaultInvert(lambda: _random().choice('\'"')))
 verticalTab    = EasyRegexSingleton(r'\v',     _defaultInvert('\v'))
 formFeed       = EasyRegexSingleton(r'\f',     _defaultInvert('\f'))
 
 # Not Chuncks
-notWhitespace = EasyRegexSingleton(r'\S', _defaultInvert(choice(_digits  + _letters     + _punctuation + '_')))
-notDigit      = EasyRegexSingleton(r'\D', _defaultInvert(choice(_letters + _whitespace  + _punctuation + '_')))
-notWord       = EasyRegexSingleton(r'\W', _defaultInvert(choice(_digits  + _punctuation + _whitespace)))
+notWhitespace = EasyRegexSingleton(r'\S', _defaultInvert(lambda: _random().choice(_digits  + _letters     + _punctuation + '_')))
+notDigit      = EasyRegexSingleton(r'\D', _defaultInvert(lambda: _random().choice(_letters + _whitespace  + _punctuation + '_')))
+notWord       = EasyRegexSingleton(r'\W', _defaultInvert(lambda: _random().choice(_digits  + _punctuation + _whitespace)))
 
 # Optionals
 optional      = EasyRegexSingleton(lambda cur, input='': cur + ('' if not len(input) else r'(' + input + r')') + r'?',
-                                   lambda cur, input='': cur + (_prevThing(cur) if not len(input) else input) * randint(0, 1))
+                                   lambda cur, input='': cur + (_prevThing(cur) if not len(input) else input) * _random().randint(0, 1))
 multiOptional = EasyRegexSingleton(lambda cur, input='': cur + ('' if not len(input) else r'(' + input + r')') + r'*',
-                                   lambda cur, input='': cur + (_prevThing(cur) if not len(input) else input) * randint(0, 3))
+                                   lambda cur, input='': cur + (_prevThing(cur) if not len(input) else input) * _random().randint(0, 3))
 either        = EasyRegexSingleton(lambda cur, input, or_input: cur + rf'({input}|{or_input})',
-                                   lambda cur, input, or_input: cur + input if randint(0, 1) else or_input)
+                                   lambda cur, input, or_input: cur + input if _random().randint(0, 1) else or_input)
 anyBetween    = EasyRegexSingleton(lambda cur, input, and_input: cur + r'[' + input + r'-' + and_input + r']')
 
 def _anyOfFunc(cur, *inputs):
@@ -483,7 +521,7 @@ def _anyOfFunc(cur, *inputs):
     cur = cur[:-1]
     cur += r')'
     return cur
-anyOf = EasyRegexSingleton(_anyOfFunc, lambda cur, *inputs: choice(inputs))
+anyOf = EasyRegexSingleton(_anyOfFunc, lambda cur, *inputs: _random().choice(inputs))
 
 def _anyExceptFunc(cur, *inputs):
     cur += r'[^'
@@ -499,19 +537,19 @@ def _anyExceptInvertedFunc(cur, *inputs):
 anyExcept  = EasyRegexSingleton(_anyExceptFunc, _anyExceptInvertedFunc)
 
 # Sets
-anyUppercase       = EasyRegexSingleton(r' [A-Z]',      _defaultInvert(choice(_letters.upper())))
-anyLowercase       = EasyRegexSingleton(r' [a-z]',      _defaultInvert(choice(_letters.lower())))
-anyLetter          = EasyRegexSingleton(r'[A-Za-z]',    _defaultInvert(choice(_letters)))
-anyAlphaNum        = EasyRegexSingleton(r'[A-Za-z0-9]', _defaultInvert(choice(_letters + _digits)))
-anyDigit           = EasyRegexSingleton(r'[0-9]',       _defaultInvert(choice(_digits)))
-anyHexDigit        = EasyRegexSingleton(r'[0-9a-fA-F]', _defaultInvert(choice(_digits + "ABCDEF")))
-anyOctDigit        = EasyRegexSingleton(r'[0-7]',       _defaultInvert(choice(_digits[:8])))
-anyPunctuation     = EasyRegexSingleton(r'[:punct:]',   _defaultInvert(choice(_punctuation)))
-anyBlank           = EasyRegexSingleton(r'[ \t\r\n\v\f]', _defaultInvert(choice(_whitespace)))
+anyUppercase       = EasyRegexSingleton(r' [A-Z]',      _defaultInvert(lambda: _random().choice(_letters.upper())))
+anyLowercase       = EasyRegexSingleton(r' [a-z]',      _defaultInvert(lambda: _random().choice(_letters.lower())))
+anyLetter          = EasyRegexSingleton(r'[A-Za-z]',    _defaultInvert(lambda: _random().choice(_letters)))
+anyAlphaNum        = EasyRegexSingleton(r'[A-Za-z0-9]', _defaultInvert(lambda: _random().choice(_letters + _digits)))
+anyDigit           = EasyRegexSingleton(r'[0-9]',       _defaultInvert(lambda: _random().choice(_digits)))
+anyHexDigit        = EasyRegexSingleton(r'[0-9a-fA-F]', _defaultInvert(lambda: _random().choice(_digits + "ABCDEF")))
+anyOctDigit        = EasyRegexSingleton(r'[0-7]',       _defaultInvert(lambda: _random().choice(_digits[:8])))
+anyPunctuation     = EasyRegexSingleton(r'[:punct:]',   _defaultInvert(lambda: _random().choice(_punctuation)))
+anyBlank           = EasyRegexSingleton(r'[ \t\r\n\v\f]', _defaultInvert(lambda: _random().choice(_whitespace)))
 anyControllers     = EasyRegexSingleton(r'[\x00-\x1F\x7F]')
-anyPrinted         = EasyRegexSingleton(r'[\x21-\x7E]', _defaultInvert(choice(_everything.replace(' ', ''))))
-anyPrintedAndSpace = EasyRegexSingleton(r'[\x20-\x7E]', _defaultInvert(choice(_everything)))
-anyAlphaNum_       = EasyRegexSingleton(r'[A-Za-z0-9_]', _defaultInvert(choice(_letters + _digits + '_')))
+anyPrinted         = EasyRegexSingleton(r'[\x21-\x7E]', _defaultInvert(lambda: _random().choice(_everything.replace(' ', ''))))
+anyPrintedAndSpace = EasyRegexSingleton(r'[\x20-\x7E]', _defaultInvert(lambda: _random().choice(_everything)))
+anyAlphaNum_       = EasyRegexSingleton(r'[A-Za-z0-9_]', _defaultInvert(lambda: _random().choice(_letters + _digits + '_')))
 
 # Numbers
 octalNum = EasyRegexSingleton(lambda cur, num: cur + r'\\' + num, lambda cur, num: cur + oct(num))
@@ -0,0 +1,10 @@
+""" benchmarks
+Scripts for measuring how fast the compiler is. Each one can be run directly
+(python benchmarks/<name>.py) or as a module (python -m benchmarks.<name>) from the repo root.
+    corpus:             Generates synthetic .emc programs of any size and shape
+    throughput:         Times each stage of the compiler on the corpus, and saves the results as JSON
+    startup:            How long the command line compiler takes to start
+    easyRegexImport:    How long importing EasyRegex takes
+    easyRegexSanitize:  How fast EasyRegex escapes its arguments
+    copeDisabled:       That Cope's decorators cost nothing with COPE_DISABLE set
+"""
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+""" copeDisabled
+Benchmark for Cope's COPE_DISABLE mode. Times calling a plain function, the same function
+decorated with @confidence and @depricated, and debug(), in a fresh interpreter with Cope enabled
+and another with it disabled, and fails if the decorated functions are any slower than the
+plain one when disabled. Run it from anywhere: python benchmarks/copeDisabled.py
+"""
+import json
+import os
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+from timeit import repeat
+
+root = abspath(join(dirname(__file__), '..'))
+
+# How much slower than undecorated a disabled decorator is allowed to measure, for noise
+TOLERANCE = 1.25
+
+
+def best(stmts, number, rounds=25) -> "{name: ns}":
+    """ The fastest time for a single run of each of stmts, in nanoseconds. They take turns, so
+        anything else slowing the machine down lands on all of them, instead of just one.
+    """
+    times = {name: float('inf') for name in stmts}
+    for _ in range(rounds):
+        for name, stmt in stmts.items():
+            times[name] = min(times[name], repeat(stmt, number=number, repeat=1)[0] / number * 1e9)
+    return times
+
+def measure():
+    """ Runs in the child interpreter, and prints the times as JSON """
+    import io
+    sys.path.insert(0, root)
+    from Cope import DISABLED, confidence, debug, depricated
+
+    def plain(a, b):
+        return a + b
+
+    @confidence(100)
+    def sure(a, b):
+        return a + b
+
+    @depricated('use plain()')
+    def old(a, b):
+        return a + b
+
+    # The enabled versions print on every call, which isn't what's being measured here
+    sys.stdout, out = io.StringIO(), sys.stdout
+    number = 200000 if DISABLED else 2000
+    try:
+        times = best({
+            'undecorated':  lambda: plain(1, 2),
+            '@confidence':  lambda: sure(1, 2),
+            '@depricated':  lambda: old(1, 2),
+            'debug(a)':     lambda: debug(1, name='a'),
+        }, number)
+    finally:
+        sys.stdout = out
+    # Disabled decorators should give back the very function they were given, not a wrapper
+    print(json.dumps({'times': times, 'unwrapped': [f.__name__ for f in (sure, old) if f.__name__ in ('sure', 'old')]}))
+
+
+def run(disabled):
+    env = dict(os.environ)
+    env.pop('COPE_DISABLE', None)
+    if disabled:
+        env['COPE_DISABLE'] = '1'
+    proc = subprocess.run([sys.executable, __file__, '--measure'], env=env, capture_output=True, text=True, check=True)
+    # Cope might warn about missing packages on import before the times are printed
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def main():
+    enabled, disabled = run(False), run(True)
+    print(f'{"call":14}{"enabled":>12}{"disabled":>12}')
+    for name in enabled['times']:
+        print(f'{name:14}{enabled["times"][name]:10.0f}ns{disabled["times"][name]:10.0f}ns')
+
+    failed = False
+    for name, func in (('@confidence', 'sure'), ('@depricated', 'old')):
+        if func not in disabled['unwrapped']:
+            print(f'{name} still wraps the function with COPE_DISABLE set')
+            failed = True
+        elif disabled['times'][name] > disabled['times']['undecorated'] * TOLERANCE:
+            print(f'{name} is slower than an undecorated function with COPE_DISABLE set')
+            failed = True
+    return int(failed)
+
+
+if __name__ == '__main__':
+    if '--measure' in sys.argv:
+        measure()
+    else:
+        sys.exit(main())
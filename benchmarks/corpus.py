@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+""" corpus
+Generates synthetic .emc programs for benchmarking, of about however many lines are asked for.
+Shapes:
+    flat:   A long list of assignments and calls, with no blocks
+    nested: while and if blocks nested depth deep, over and over
+    ops:    Nothing but namespace.py math and comparison ops
+    names:  Lots of different bare variable names, which all have to be looked up as constants first
+    consts: A quarter of the lines set a different variable to a number, and the rest read them in small ifs
+    deepIfs: Ifs nested as deep as the lines allow, on a comparison that can't be folded
+Run it to write a program to a file: python benchmarks/corpus.py nested 10000 -o nested.emc
+"""
+import argparse
+import random
+import sys
+
+shapes = ('flat', 'nested', 'ops', 'names', 'consts', 'deepIfs')
+
+# Namespace functions that take (var, a, b)
+_binaryOps = ('add', 'sub', 'mul', 'div', 'idiv', 'mod', 'pow', 'max', 'min', 'equal', 'notEqual',
+              'lessThan', 'lessThanEq', 'greaterThan', 'greaterThanEq', 'bitShiftLeft', 'bitor', 'bitxor')
+# Namespace functions that take (var, a)
+_unaryOps = ('abs', 'log', 'sin', 'cos', 'floor', 'ceil', 'sqrt')
+_comparisons = ('==', '!=', '<', '<=', '>', '>=')
+
+
+def _value(rand, names):
+    return rand.choice(names) if rand.random() < .6 else str(rand.randint(-100, 1000))
+
+def _statement(rand, names):
+    kind = rand.random()
+    var = rand.choice(names)
+    if kind < .3:
+        return f'{var} = {_value(rand, names)}'
+    if kind < .5:
+        return f'increment({var})'
+    if kind < .7:
+        return f'{rand.choice(_binaryOps)}({var}, {_value(rand, names)}, {_value(rand, names)})'
+    if kind < .9:
+        return f'print({var})'
+    return 'printflush(message1)'
+
+def _condition(rand, names):
+    return f'{rand.choice(names)} {rand.choice(_comparisons)} {_value(rand, names)}'
+
+
+def flat(lines, rand):
+    names = [f'v{i}' for i in range(20)]
+    return [_statement(rand, names) for _ in range(lines)]
+
+def nested(lines, rand, depth=50):
+    """ Blocks nested depth deep, with a statement in each, repeated until there's enough lines """
+    names = [f'v{i}' for i in range(20)]
+    out = []
+    while len(out) < lines:
+        levels = min(depth, max(1, (lines - len(out)) // 3))
+        for level in range(levels):
+            indent = '    ' * level
+            out.append(f'{indent}{rand.choice(("while", "if", "dowhile"))} ({_condition(rand, names)}) {{')
+            out.append(f'{indent}    {_statement(rand, names)}')
+        for level in reversed(range(levels)):
+            out.append('    ' * level + '}')
+    return out
+
+def ops(lines, rand):
+    names = [f'v{i}' for i in range(20)]
+    out = []
+    for _ in range(lines):
+        if rand.random() < .75:
+            out.append(f'{rand.choice(_binaryOps)}({rand.choice(names)}, {_value(rand, names)}, {_value(rand, names)})')
+        else:
+            out.append(f'{rand.choice(_unaryOps)}({rand.choice(names)}, {_value(rand, names)})')
+    return out
+
+def names(lines, rand):
+    """ Every line uses variables nobody's used before """
+    out = []
+    for cnt in range(lines):
+        new = [f'var{cnt}_{i}' for i in range(3)]
+        out.append(f'add({new[0]}, {new[1]}, {new[2]})' if cnt % 2 else f'{new[0]} = {new[1]}')
+    return out
+
+def consts(lines, rand):
+    """ Every one of the constants is known all the way through the program, however many ifs it goes through """
+    count = max(1, lines // 4)
+    out = [f'c{i} = {i}' for i in range(count)]
+    for i in range(count):
+        out += [f'if ({_condition(rand, ("a", "b"))}){{', f'    print(c{i})', '}']
+    return out
+
+def deepIfs(lines, rand):
+    """ Not indented, since the indents would make the text grow with the square of the lines """
+    depth = max(1, (lines - 1) // 2)
+    return ['if (a === b){'] * depth + ['print(a)'] + ['}'] * depth
+
+
+def generate(shape, lines, seed=0, **kwargs) -> str:
+    """ Makes a program of about lines lines, in one of the shapes """
+    if shape not in shapes:
+        raise ValueError(f'Unknown shape {shape}, must be one of {shapes}')
+    return '\n'.join(globals()[shape](lines, random.Random(seed), **kwargs)) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic .emc program')
+    parser.add_argument('shape', choices=shapes)
+    parser.add_argument('lines', type=int, help='About how many lines long the program should be')
+    parser.add_argument('-o', '--outfile', default=None, help='Where to write the program (prints it by default)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=None, help='How deep to nest blocks, for the nested shape')
+    args = parser.parse_args(argv)
+
+    text = generate(args.shape, args.lines, args.seed, **({'depth': args.depth} if args.depth else {}))
+    if args.outfile:
+        with open(args.outfile, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" easyRegexImport
+Import-time benchmark for EasyRegex. Imports it in fresh interpreters under python -X importtime
+and reports how long the import took, and which of the modules only inverse() needs got loaded.
+Run it from anywhere: python benchmarks/easyRegexImport.py [runs]
+"""
+import os
+import re
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+from statistics import median
+
+root = abspath(join(dirname(__file__), '..'))
+
+# Modules that are only needed to invert chains, and shouldn't be imported just to match
+inverseOnly = ('random', 'random_word')
+
+_erImportTime = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$', re.M)
+
+
+def importTimes(module, env) -> "{module: (self us, cumulative us)}":
+    """ Imports module in a new interpreter, and parses what -X importtime says about it """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=root, env=env, capture_output=True, text=True, check=True)
+    return {m.group(4): (int(m.group(1)), int(m.group(2))) for m in _erImportTime.finditer(proc.stderr)}
+
+
+def main(runs=20):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (root, env.get('PYTHONPATH'))))
+    # We want to time importing, not compiling to bytecode
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    importTimes('EasyRegex', env)
+
+    results = [importTimes('EasyRegex', env) for _ in range(runs)]
+    selfTime = median(i['EasyRegex'][0] for i in results)
+    cumulative = median(i['EasyRegex'][1] for i in results)
+    print(f'import EasyRegex (median of {runs}): {selfTime / 1000:.2f}ms self, {cumulative / 1000:.2f}ms cumulative')
+    for module in inverseOnly:
+        print(f'  {module:12} {"imported" if module in results[0] else "not imported"}')
+    return int(any(module in results[0] for module in inverseOnly))
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(int, sys.argv[1:])))
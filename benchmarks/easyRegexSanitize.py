@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" easyRegexSanitize
+Micro-benchmark for EasyRegexSingleton._sanitizeInput, comparing the old way of escaping
+(one re.sub per escape character) to the current single pass, on the strings and patterns
+the compiler actually builds. Run it from anywhere: python benchmarks/easyRegexSanitize.py
+"""
+import re
+import sys
+from os.path import dirname, join
+from timeit import repeat
+
+sys.path.insert(0, join(dirname(__file__), '..'))
+
+from EasyRegex import *
+from EasyRegex import EasyRegexSingleton
+from namespace import ops
+
+# The string arguments mindustryCompiler.py and namespace.py pass to EasyRegex calls
+inputs = ['jump ', '-', *sorted(ops.keys(), key=len, reverse=True)]
+
+
+def oldSanitize(self, i):
+    """ How _sanitizeInput used to escape strings, kept here as the baseline """
+    if type(i) is EasyRegexMember:
+        return str(i)
+    for part in self.escapeChars:
+        i = re.sub(r'(?<!\\)' + part, part, i)
+    return i
+
+def buildPatterns():
+    """ Builds the same chains the compiler does """
+    str(optional(whitechunk()) + 'jump ' + group(optional('-') + number()))
+    str(group(word()) + optional(whitechunk()) + group(anyOf(*sorted(ops.keys(), key=len, reverse=True))) + optional(whitechunk()) + group(chunk()))
+
+def best(stmt, number):
+    """ The fastest time for a single run of stmt, in microseconds """
+    return min(repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    singleton = optional
+    newSanitize = EasyRegexSingleton._sanitizeInput
+    for i in inputs:
+        assert oldSanitize(singleton, i) == newSanitize(singleton, i), i
+
+    old = best(lambda: [oldSanitize(singleton, i) for i in inputs], 2000)
+    new = best(lambda: [newSanitize(singleton, i) for i in inputs], 2000)
+    print(f'sanitizing {len(inputs)} compiler arguments: {old:8.2f}us -> {new:8.2f}us ({old / new:.1f}x)')
+
+    EasyRegexSingleton._sanitizeInput = oldSanitize
+    try:
+        old = best(buildPatterns, 500)
+    finally:
+        EasyRegexSingleton._sanitizeInput = newSanitize
+    new = best(buildPatterns, 500)
+    print(f'building erJump and erCondition:   {old:8.2f}us -> {new:8.2f}us ({old / new:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
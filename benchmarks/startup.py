@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+""" startup
+Cold start benchmark for the compiler CLI, the way an editor hook runs it on every save:
+one fresh interpreter per compile, writing to a file with -o.
+Measures the imports with python -X importtime, and the whole run's wall time against an empty
+interpreter, and fails if either goes over budget or anything that a compile doesn't need gets imported.
+Run it from anywhere: python benchmarks/startup.py [runs]
+"""
+import os
+import re
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+root = abspath(join(dirname(__file__), '..'))
+
+# Budgets, in milliseconds, on top of what an empty interpreter takes
+IMPORT_BUDGET = 40
+WALL_BUDGET   = 60
+
+# Modules a compile to a file should never import
+unneeded = ('clipboard', 'Cope', 'concurrent.futures', 'multiprocessing', 'tempfile', 'random', 'random_word', 'inspect')
+
+program = '''
+i = 0
+while (i < 10) {
+    if (i == 5) {
+        print("five")
+    }
+    increment(i)
+}
+printflush(message1)
+'''
+
+_erImportTime = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$', re.M)
+
+
+def run(args, env) -> "(wall ms, {module: cumulative us} for the top level imports, every module imported)":
+    start = perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=root, env=env, capture_output=True, text=True, check=True)
+    wall = (perf_counter() - start) * 1000
+    found = _erImportTime.findall(proc.stderr)
+    return wall, {name: int(cumulative) for _, cumulative, indent, name in found if not indent}, {i[3] for i in found}
+
+
+def main(runs=15):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (root, env.get('PYTHONPATH'))))
+    # We want to time importing, not compiling to bytecode
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    with TemporaryDirectory() as tmp:
+        source, out = join(tmp, 'program.emc'), join(tmp, 'program.mlog')
+        with open(source, 'w') as f:
+            f.write(program)
+        compile = [join(root, 'mindustryCompiler.py'), source, '-o', out, '--no-cache']
+        baseline = ['-c', 'pass']
+        # Warm up, so the bytecode is cached
+        run(compile, env)
+
+        empty = [run(baseline, env) for _ in range(runs)]
+        full  = [run(compile,  env) for _ in range(runs)]
+
+    emptyModules = set(empty[0][1])
+    importTime = median(sum(t for name, t in i[1].items() if name not in emptyModules) for i in full) / 1000
+    wallTime = median(i[0] for i in full) - median(i[0] for i in empty)
+    imported = set.union(*(i[2] for i in full))
+
+    print(f'Compiling one file from the command line (median of {runs}, over an empty interpreter):')
+    print(f'    imports   {importTime:7.2f}ms (budget {IMPORT_BUDGET}ms)')
+    print(f'    wall time {wallTime:7.2f}ms (budget {WALL_BUDGET}ms)')
+    slowest = sorted(((t, name) for name, t in full[-1][1].items() if name not in emptyModules), reverse=True)[:5]
+    print('    slowest imports: ' + ', '.join(f'{name} {t / 1000:.2f}ms' for t, name in slowest))
+
+    failed = False
+    for module in unneeded:
+        if module in imported:
+            print(f'{module} was imported, but compiling doesn\'t need it')
+            failed = True
+    if importTime > IMPORT_BUDGET or wallTime > WALL_BUDGET:
+        print('Over budget')
+        failed = True
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(int, sys.argv[1:])))
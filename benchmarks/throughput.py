@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+""" throughput
+Times each stage of the compiler (tokenizing, parsing, generating, optimizing, resolving labels, and
+serializing) on synthetic programs from corpus.py, at several sizes, and saves the results as JSON.
+Resolving and serializing run on the unoptimized program, so they time the same work at every -O level.
+Give it the JSON from an earlier run with --compare to see what got faster or slower.
+Run it from anywhere: python benchmarks/throughput.py [-o results.json] [--compare old.json]
+"""
+import argparse
+import json
+import platform
+import sys
+from os.path import dirname, join
+from time import perf_counter, strftime
+
+sys.path.insert(0, join(dirname(__file__), '..'))
+
+import mindustryCompiler as compiler
+import mlog
+from emcParser import parse, tokenize
+
+try:
+    from benchmarks.corpus import generate, shapes
+except ImportError:
+    from corpus import generate, shapes
+
+sizes = (1000, 10000, 100000)
+stageNames = ('tokenize', 'parse', 'generate', 'optimize', 'resolve', 'serialize')
+
+
+def best(func, repeats) -> "(fastest time in seconds, what func returned)":
+    fastest = float('inf')
+    for _ in range(repeats):
+        start = perf_counter()
+        result = func()
+        fastest = min(fastest, perf_counter() - start)
+    return fastest, result
+
+def timeStages(text, repeats) -> "({stage: seconds}, instructions, instructions after optimizing)":
+    """ Times each stage on its own, feeding it the output of the stage before. Optimizing is timed
+        off to the side: the ops and names shapes never print anything, so the optimizer takes all of
+        them out, and resolving and serializing them would end up timing an empty program.
+    """
+    times = {}
+    times['tokenize'], _       = best(lambda: list(tokenize(text)), repeats)
+    # Parsing tokenizes the text too, so this includes the tokenize time
+    times['parse'], program    = best(lambda: parse(text), repeats)
+    times['generate'], lines   = best(lambda: compiler.generate(program.body), repeats)
+    times['optimize'], opt     = best(lambda: compiler.optimize(lines), repeats)
+    times['resolve'], resolved = best(lambda: compiler.resolveLabels(lines), repeats)
+    times['serialize'], _      = best(lambda: mlog.serialize(resolved), repeats)
+    return times, len(resolved), compiler.size(opt)
+
+
+def run(sizes=sizes, shapes=shapes, repeats=3) -> dict:
+    results = {
+        'version': compiler.__version__,
+        'python': platform.python_version(),
+        'date': strftime('%Y-%m-%d %H:%M:%S'),
+        'results': [],
+    }
+    for shape in shapes:
+        for size in sizes:
+            text = generate(shape, size)
+            # The biggest programs take long enough that the noise doesn't matter as much
+            times, instructions, optimized = timeStages(text, repeats if size < 100000 else 1)
+            total = sum(times.values())
+            results['results'].append({
+                'shape': shape,
+                'lines': text.count('\n'),
+                'instructions': instructions,
+                'optimized': optimized,
+                'stages': times,
+                'total': total,
+                'linesPerSecond': text.count('\n') / total,
+            })
+            print(f'{shape:>7} {size:>7} lines: ' + '  '.join(f'{i} {times[i] * 1000:9.2f}ms' for i in stageNames) +
+                  f'  total {total * 1000:9.2f}ms ({text.count(chr(10)) / total:,.0f} lines/s)')
+    return results
+
+def compare(old, new):
+    """ Prints how much each result changed between two runs """
+    print(f'\nCompared to version {old["version"]} from {old["date"]}:')
+    previous = {(i['shape'], i['lines']): i for i in old['results']}
+    for i in new['results']:
+        before = previous.get((i['shape'], i['lines']))
+        if before is None:
+            continue
+        changes = '  '.join(f'{stage} {before["stages"][stage] / i["stages"][stage]:5.2f}x'
+                            for stage in stageNames if stage in before['stages'] and i['stages'][stage])
+        print(f'{i["shape"]:>7} {i["lines"]:>7} lines: {changes}  total {before["total"] / i["total"]:5.2f}x faster')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time each stage of the compiler on synthetic programs')
+    parser.add_argument('-o', '--outfile', default=None, help='Where to save the results (defaults to throughput-<version>.json)')
+    parser.add_argument('--compare', default=None, help='Results from an earlier run to compare to')
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes, help='How many lines long the programs should be')
+    parser.add_argument('--shapes', nargs='+', choices=shapes, default=shapes)
+    parser.add_argument('--repeats', type=int, default=3, help='How many times to time each stage (the fastest one is kept)')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.shapes, args.repeats)
+    outfile = args.outfile or f'throughput-{compiler.__version__}.json'
+    with open(outfile, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f'Saved the results to {outfile}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+""" compileCache
+A persistent on-disk cache of finished compiles, so programs that haven't changed since the last
+build are read back from disk instead of being recompiled.
+Entries are keyed on a hash of everything that can change the output: the program text, the
+compiler version, the source of the compiler and namespace modules, and the compile options.
+"""
+from hashlib import sha256
+from os import environ, listdir, makedirs, remove, replace, stat, utime
+from os.path import dirname, expanduser, join
+
+# The modules whose source affects what a program compiles to
+_compilerModules = ('mindustryCompiler.py', 'emcParser.py', 'mlog.py', 'optimizer.py', 'namespace.py', 'customNamespace.py')
+_fingerprint = None
+
+def compilerFingerprint(version) -> str:
+    """ A hash of the compiler version and source. Only computed once per process. """
+    global _fingerprint
+    if _fingerprint is None:
+        h = sha256(version.encode())
+        for module in _compilerModules:
+            with open(join(dirname(__file__), module), 'rb') as f:
+                h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+def resetFingerprint():
+    """ Makes the next compilerFingerprint() call rehash the source, for when the modules are reloaded """
+    global _fingerprint
+    _fingerprint = None
+
+def defaultCacheDir():
+    return join(environ.get('XDG_CACHE_HOME') or expanduser(join('~', '.cache')), 'mindustryCompiler')
+
+
+class CompileCache:
+    """ Stores compiled programs as files in directory, evicting the least recently used ones
+        once they take up more than maxSize bytes in total.
+    """
+    extension = '.mlog'
+
+    def __init__(self, directory=None, maxSize=64 * 1024 * 1024):
+        self.directory = directory or defaultCacheDir()
+        self.maxSize = maxSize
+        # How much space the cache takes up. Only calculated the first time something is written.
+        self._size = None
+
+    def key(self, text, version, options='') -> str:
+        h = sha256(compilerFingerprint(version).encode())
+        h.update(options.encode())
+        h.update(b'\0')
+        h.update(text.encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return join(self.directory, key + self.extension)
+
+    def get(self, key):
+        """ Returns the cached output for key, or None if it isn't cached """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                output = f.read()
+        except OSError:
+            return None
+        # Mark it as recently used, for eviction
+        try:
+            utime(path)
+        except OSError:
+            pass
+        return output
+
+    def put(self, key, output):
+        """ Caches output under key. Failing to write the cache is never an error. """
+        # tempfile is slow to import, and reading the cache doesn't need it
+        from tempfile import NamedTemporaryFile
+        try:
+            makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first, so other processes never see a half written entry
+            with NamedTemporaryFile('w', dir=self.directory, suffix='.tmp', delete=False) as f:
+                f.write(output)
+            replace(f.name, self._path(key))
+        except OSError:
+            return
+
+        if self._size is None:
+            self._size = sum(i[1] for i in self._entries())
+        else:
+            self._size += len(output)
+        if self._size > self.maxSize:
+            self.evict()
+
+    def _entries(self) -> "[(path, size, last used)]":
+        entries = []
+        try:
+            names = listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(self.extension):
+                continue
+            path = join(self.directory, name)
+            try:
+                s = stat(path)
+            except OSError:
+                continue
+            entries.append((path, s.st_size, s.st_mtime))
+        return entries
+
+    def evict(self, target=None):
+        """ Deletes the least recently used entries until the cache is under target bytes
+            (3/4 of maxSize by default, so we're not evicting on every write)
+        """
+        target = self.maxSize * 3 // 4 if target is None else target
+        entries = sorted(self._entries(), key=lambda i: i[2])
+        size = sum(i[1] for i in entries)
+        for path, entrySize, _ in entries:
+            if size <= target:
+                break
+            try:
+                remove(path)
+            except OSError:
+                continue
+            size -= entrySize
+        self._size = size
+
+    def clear(self):
+        self.evict(0)
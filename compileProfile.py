@@ -0,0 +1,99 @@
+""" compileProfile
+Measures where the time and memory in a compile go, stage by stage, for the --profile option.
+Timing, tracing allocations, and cProfile each get their own run of the compile, since tracing
+allocations or function calls slows everything down enough to throw off the times.
+"""
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter, process_time
+
+
+class Stage:
+    """ What one stage of a compile took. Memory is in bytes, and blocks is how many more blocks
+        of memory were allocated than freed during the stage.
+    """
+    __slots__ = ('name', 'wall', 'cpu', 'blocks', 'allocated', 'peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = self.cpu = 0.0
+        self.blocks = self.allocated = self.peak = 0
+
+
+class CompileProfile:
+    """ Wrap each stage of a compile in stage(name), then run the whole compile with time(),
+        traceMemory(), and (optionally) dumpCalls() to fill in the numbers.
+    """
+    def __init__(self):
+        self.stages = {}
+        self._tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+
+        if self._tracing:
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            before = tracemalloc.take_snapshot().filter_traces(ignore)
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            yield
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+            stage.blocks += sum(i.count_diff for i in after.compare_to(before, 'filename'))
+            stage.allocated += current - start
+            stage.peak = max(stage.peak, peak - start)
+        else:
+            wall, cpu = perf_counter(), process_time()
+            yield
+            stage.wall += perf_counter() - wall
+            stage.cpu += process_time() - cpu
+
+    def time(self, run):
+        """ Calls run, timing the stages in it """
+        return run()
+
+    def traceMemory(self, run):
+        """ Calls run, recording how much memory the stages in it allocate """
+        self._tracing = True
+        tracemalloc.start()
+        try:
+            return run()
+        finally:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def dumpCalls(self, run, path):
+        """ Calls run under cProfile, and saves the stats to path (open it with pstats or snakeviz) """
+        import cProfile
+        profiler = cProfile.Profile()
+        # Don't let the stages count their time twice
+        times = {name: (i.wall, i.cpu) for name, i in self.stages.items()}
+        try:
+            return profiler.runcall(run)
+        finally:
+            profiler.dump_stats(path)
+            for name, (wall, cpu) in times.items():
+                self.stages[name].wall, self.stages[name].cpu = wall, cpu
+
+    def table(self) -> str:
+        """ A table of every stage, in the order they ran """
+        rows = [(i.name, f'{i.wall:.5f}', f'{i.cpu:.5f}', f'{i.blocks:,}', _size(i.allocated), _size(i.peak))
+                for i in self.stages.values()]
+        rows.append(('total', f'{sum(i.wall for i in self.stages.values()):.5f}', f'{sum(i.cpu for i in self.stages.values()):.5f}',
+                     f'{sum(i.blocks for i in self.stages.values()):,}', _size(sum(i.allocated for i in self.stages.values())),
+                     _size(max((i.peak for i in self.stages.values()), default=0))))
+        header = ('stage', 'wall (s)', 'cpu (s)', 'blocks', 'allocated', 'peak')
+        widths = [max(len(row[col]) for row in rows + [header]) for col in range(len(header))]
+        return '\n'.join('  '.join(cell.ljust(w) if col == 0 else cell.rjust(w) for col, (cell, w) in enumerate(zip(row, widths)))
+                         for row in [header] + rows)
+
+
+def _size(size) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}GB'
@@ -1,27 +1,33 @@
 from namespace import *
 
 def printf(thing, to='message1'):
-    return f"""
-    print {thing}
-    printflush {to}
-    """
-    # print(thing)
-    # printFlush(to)
+    return [print(thing), printflush(to)]
 
+# Goes through the processor's links until it finds one of the given type, and puts it in buildingVar
 def getLinkOfType(type, buildingVar='building'):
-    return """
-    set('linkCounter', 0)
-    getlink(var, 'linkCounter')
-    sensor('buildingType', var, '@type')
-    jump(-3, f"buildingType == @{type}")
-    """
+    type = type if type.startswith('@') else '@' + type
+    loop = Label()
+    return [
+        set('linkCounter', 0),
+        loop,
+        getlink(buildingVar, 'linkCounter'),
+        sensor('buildingType', buildingVar, '@type'),
+        increment('linkCounter'),
+        jump(loop, f'buildingType != {type}'),
+    ]
 
+# Goes through the processor's links until it finds a message, processor, or memory cell, and puts it in buildingVar
 def getNormalLink(buildingVar='building'):
-    return """
-    set('linkCounter', 0)
-    getlink(var, 'linkCounter')
-    sensor('buildingType', var, '@type')
-    jump(-3, f"buildingType == @message")
-    jump(-4, f"buildingType == @processor")
-    jump(-5, f"buildingType == @memorycell")
-    """
\ No newline at end of file
+    loop, found = Label(), Label()
+    return [
+        set('linkCounter', 0),
+        loop,
+        getlink(buildingVar, 'linkCounter'),
+        sensor('buildingType', buildingVar, '@type'),
+        increment('linkCounter'),
+        jump(found, f'buildingType == {message}'),
+        jump(found, f'buildingType == {processor}'),
+        jump(found, f'buildingType == {memoryCell}'),
+        jump(loop, 'true'),
+        found,
+    ]
@@ -0,0 +1,22 @@
+// Starts emcLanguageServer.py and hooks it up to .emc files
+const path = require('path');
+const vscode = require('vscode');
+const { LanguageClient } = require('vscode-languageclient/node');
+
+let client;
+
+function activate(context) {
+    const config = vscode.workspace.getConfiguration('easymindustrycode');
+    const server = config.get('serverPath') || path.join(context.extensionPath, '..', 'emcLanguageServer.py');
+
+    client = new LanguageClient('emc', 'Easy Mindustry Code',
+        { command: config.get('pythonPath'), args: [server] },
+        { documentSelector: [{ language: 'emc' }] });
+    context.subscriptions.push(client.start());
+}
+
+function deactivate() {
+    return client ? client.stop() : undefined;
+}
+
+module.exports = { activate, deactivate };
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+""" emcLanguageServer
+A Language Server Protocol server for .emc files, used by the easymindustrycode VSCode extension
+(or any other editor that speaks LSP). It talks JSON-RPC over stdin and stdout, so just run it.
+
+Documents are kept parsed in memory as a list of top level statements. When a document is edited,
+only the statements the edit touches are reparsed and recompiled, since tokens never span lines
+and a top level statement always starts and ends on a line boundary of the region around it.
+Provides diagnostics, instruction counts (as code lenses), and hover info for namespace functions.
+"""
+import json
+import re
+import sys
+from bisect import bisect_left
+from inspect import getcomments, getdoc, signature
+
+import mindustryCompiler as compiler
+from emcParser import blocks, parse
+
+# Processors can't hold any more instructions than this
+MAX_INSTRUCTIONS = 1000
+
+_erWord = re.compile(r'@?[\w\-]+')
+# Errors say where they are in their message, but the line numbers are relative to the region that was parsed
+_erPosition = re.compile(r' \(line \d+, column \d+\)$')
+
+
+################################### Documents ###################################
+class Statement:
+    """ A top level statement, and what it compiled to. Its node's line numbers are relative to
+        the region it was parsed in, so offset is added to get the real (0 based) line.
+    """
+    __slots__ = ('node', 'offset', 'count', 'error')
+
+    def __init__(self, node, offset):
+        self.node = node
+        self.offset = offset
+        try:
+            self.count = len(compiler.resolveLabels(compiler.optimize(compiler.generate([node]), partial=True)))
+            self.error = None
+        except SyntaxError as err:
+            self.count = 0
+            self.error = err
+
+    @property
+    def start(self):
+        return self.node.line - 1 + self.offset
+
+    @property
+    def end(self):
+        return self.node.endLine - 1 + self.offset
+
+
+class Document:
+    def __init__(self, uri, text):
+        self.uri = uri
+        self.lines = text.split('\n')
+        self.statements = []
+        # The parse error the document currently has, if any, and its 0 based line
+        self.error = None
+        self.errorLine = 0
+        self.reparseAll()
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    @property
+    def count(self):
+        return sum(i.count for i in self.statements)
+
+    def _parseRegion(self, first, last) -> "[Statement]":
+        """ Parses lines first through last (0 based, inclusive). Raises SyntaxError. """
+        program = parse('\n'.join(self.lines[first:last + 1]), self.uri)
+        return [Statement(node, first) for node in program.body]
+
+    def reparseAll(self):
+        try:
+            self.statements = self._parseRegion(0, len(self.lines) - 1)
+            self.error = None
+        except SyntaxError as err:
+            self.statements = []
+            self.error = err
+            self.errorLine = (err.lineno or 1) - 1
+
+    def edit(self, change):
+        """ Applies a single textDocument/didChange content change, reparsing as little as possible """
+        if 'range' not in change:
+            self.lines = change['text'].split('\n')
+            return self.reparseAll()
+
+        start, end = change['range']['start'], change['range']['end']
+        first, last = start['line'], end['line']
+        prefix = self.lines[first][:_fromUtf16(self.lines[first], start['character'])] if first < len(self.lines) else ''
+        suffix = self.lines[last][_fromUtf16(self.lines[last], end['character']):] if last < len(self.lines) else ''
+        replacement = (prefix + change['text'] + suffix).split('\n')
+        self.lines[first:last + 1] = replacement
+        delta = len(replacement) - (last - first + 1)
+
+        # We don't know what state the document was in, so start over
+        if self.error is not None:
+            return self.reparseAll()
+
+        # Find the statements that share a line with the edit, and reparse the lines they cover.
+        # Growing the region can pull in more statements that share its first or last line, so keep going until it stops.
+        lo = hi = bisect_left([i.end for i in self.statements], first)
+        regionStart, regionEnd = first, last
+        while True:
+            while lo > 0 and self.statements[lo - 1].end >= regionStart:
+                lo -= 1
+            while hi < len(self.statements) and self.statements[hi].start <= regionEnd:
+                hi += 1
+            newStart = min([regionStart] + [i.start for i in self.statements[lo:hi]])
+            newEnd   = max([regionEnd]   + [i.end   for i in self.statements[lo:hi]])
+            if (newStart, newEnd) == (regionStart, regionEnd):
+                break
+            regionStart, regionEnd = newStart, newEnd
+        regionEnd += delta
+
+        try:
+            new = self._parseRegion(regionStart, regionEnd)
+        except SyntaxError:
+            # Probably an unfinished block, which needs the rest of the file to make sense of
+            return self.reparseAll()
+
+        for i in self.statements[hi:]:
+            i.offset += delta
+        self.statements[lo:hi] = new
+
+    def statementAt(self, line):
+        # The statements are in order, so this could be a binary search, but it's fast enough
+        for i in self.statements:
+            if i.start <= line <= i.end:
+                return i
+        return None
+
+    def diagnostics(self):
+        errors = [(self.error, self.errorLine)] if self.error else []
+        # Errors from generating code don't always know their line, so point at the statement instead
+        errors += [(i.error, (i.error.lineno or i.node.line) - 1 + i.offset) for i in self.statements if i.error]
+        return [{
+            'range': _range(line, (err.offset or 1) - 1, line, len(self.lines[line]) if line < len(self.lines) else 0),
+            'severity': 1,
+            'source': 'emc',
+            'message': _erPosition.sub('', err.msg),
+        } for err, line in errors] + ([{
+            'range': _range(0, 0, 0, len(self.lines[0])),
+            'severity': 2,
+            'source': 'emc',
+            'message': f'This program is {self.count} instructions long, but processors can only hold {MAX_INSTRUCTIONS}',
+        }] if self.count > MAX_INSTRUCTIONS else [])
+
+    def codeLenses(self):
+        lenses = [{'range': _range(0, 0, 0, 0), 'command': {'title': f'{self.count} instructions', 'command': ''}}]
+        for i in self.statements:
+            if isinstance(i.node, blocks):
+                lenses.append({'range': _range(i.start, 0, i.start, 0), 'command': {'title': f'{i.count} instructions', 'command': ''}})
+        return lenses
+
+    def hover(self, line, character):
+        if line >= len(self.lines):
+            return None
+        text = self.lines[line]
+        character = _fromUtf16(text, character)
+        for m in _erWord.finditer(text):
+            if m.start() <= character <= m.end():
+                word = m.group()
+                break
+        else:
+            return None
+
+        if word in compiler.emitters:
+            func = compiler.emitters[word]
+            about = [f'```python\n{word}{signature(func)}\n```']
+            if getdoc(func):
+                about.append(getdoc(func))
+            elif getcomments(func):
+                about.append('\n'.join(i.lstrip('# ') for i in getcomments(func).splitlines()))
+        elif word in compiler.constants:
+            about = [f'`{word}` = `{compiler.constants[word]}`']
+        else:
+            return None
+
+        statement = self.statementAt(line)
+        if statement is not None and statement.error is None:
+            about.append(f'This statement compiles to {statement.count} instruction{"" if statement.count == 1 else "s"}')
+        return {'contents': {'kind': 'markdown', 'value': '\n\n'.join(about)},
+                'range': _range(line, m.start(), line, m.end())}
+
+
+def _range(startLine, startChar, endLine, endChar):
+    return {'start': {'line': startLine, 'character': startChar}, 'end': {'line': endLine, 'character': endChar}}
+
+def _fromUtf16(line, character):
+    """ LSP positions count UTF-16 code units, this turns one into an index into line """
+    if line.isascii():
+        return character
+    units = 0
+    for cnt, c in enumerate(line):
+        if units >= character:
+            return cnt
+        units += 2 if ord(c) > 0xFFFF else 1
+    return len(line)
+
+
+################################### Server ###################################
+class LanguageServer:
+    def __init__(self, input=None, output=None):
+        """ input and output are binary streams, stdin and stdout if they aren't given """
+        self.input = sys.stdin.buffer if input is None else input
+        self.output = sys.stdout.buffer if output is None else output
+        self.documents = {}
+        self.shutdown = False
+
+    def read(self):
+        """ Reads a single message, or returns None at the end of the input """
+        length = None
+        while True:
+            header = self.input.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return json.loads(self.input.read(length))
+
+    def send(self, message):
+        body = json.dumps(message, separators=(',', ':')).encode()
+        self.output.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.output.flush()
+
+    def notify(self, method, params):
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    def publish(self, doc):
+        self.notify('textDocument/publishDiagnostics', {'uri': doc.uri, 'diagnostics': doc.diagnostics()})
+
+    def run(self):
+        while True:
+            message = self.read()
+            if message is None or message.get('method') == 'exit':
+                return 0 if self.shutdown else 1
+
+            method = message.get('method')
+            handler = getattr(self, 'on_' + method.replace('/', '_').replace('$', '_'), None) if method else None
+            if 'id' not in message:
+                if handler is not None:
+                    # Notifications don't get a reply, so there's nowhere to send an error but stderr
+                    try:
+                        handler(message.get('params') or {})
+                    except Exception as err:
+                        print(f'Error handling {method}: {err!r}', file=sys.stderr)
+                continue
+
+            if handler is None:
+                self.send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32601, 'message': f'Unknown method {method}'}})
+                continue
+            try:
+                result = handler(message.get('params') or {})
+            except Exception as err:
+                self.send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32603, 'message': str(err)}})
+            else:
+                self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    # Lifecycle
+    def on_initialize(self, params):
+        return {
+            'capabilities': {
+                # Incremental
+                'textDocumentSync': {'openClose': True, 'change': 2},
+                'hoverProvider': True,
+                'codeLensProvider': {'resolveProvider': False},
+            },
+            'serverInfo': {'name': 'emcLanguageServer', 'version': compiler.__version__},
+        }
+
+    def on_shutdown(self, params):
+        self.shutdown = True
+        return None
+
+    # Documents
+    def on_textDocument_didOpen(self, params):
+        doc = Document(params['textDocument']['uri'], params['textDocument']['text'])
+        self.documents[doc.uri] = doc
+        self.publish(doc)
+
+    def on_textDocument_didChange(self, params):
+        doc = self.documents[params['textDocument']['uri']]
+        for change in params['contentChanges']:
+            doc.edit(change)
+        self.publish(doc)
+
+    def on_textDocument_didClose(self, params):
+        doc = self.documents.pop(params['textDocument']['uri'], None)
+        if doc is not None:
+            self.notify('textDocument/publishDiagnostics', {'uri': doc.uri, 'diagnostics': []})
+
+    # Features
+    def on_textDocument_hover(self, params):
+        doc = self.documents.get(params['textDocument']['uri'])
+        return doc and doc.hover(params['position']['line'], params['position']['character'])
+
+    def on_textDocument_codeLens(self, params):
+        doc = self.documents.get(params['textDocument']['uri'])
+        return doc.codeLenses() if doc else []
+
+
+if __name__ == '__main__':
+    # stdout is reserved for talking to the editor, so anything else that gets printed goes to stderr
+    output = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    sys.exit(LanguageServer(output=output).run())
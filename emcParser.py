@@ -0,0 +1,321 @@
+""" emcParser
+Turns .emc source code into a syntax tree. The tokenizer walks the text exactly once, and
+the parser is a plain recursive descent parser over the tokens it produces, so the whole
+front end is linear in the size of the program. parseStream() does the same thing a few lines at
+a time, for programs too big to want in memory all at once.
+"""
+import re
+
+keywords    = ('while', 'dowhile', 'if', 'else')
+comparisons = ('===', '==', '!=', '<=', '>=', '<', '>')
+
+
+################################### Tokenizer ###################################
+# Order matters: the first alternative that matches wins
+_tokenSpec = (
+    ('comment', r'#[^\n]*'),
+    ('newline', r'\n'),
+    ('space',   r'[ \t\r\f\v]+'),
+    ('number',  r'\d+(?:\.\d+)?'),
+    ('string',  r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\''),
+    ('name',    r'@[\w\-]+|[A-Za-z_]\w*'),
+    ('op',      r'===|==|!=|<=|>=|[<>=(){},\-]'),
+    ('error',   r'.'),
+)
+_tokenRegex = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in _tokenSpec))
+
+
+class Token:
+    __slots__ = ('type', 'value', 'line', 'col')
+
+    def __init__(self, type, value, line, col):
+        self.type  = type
+        self.value = value
+        self.line  = line
+        self.col   = col
+
+    def __repr__(self):
+        return f'Token({self.type}, {self.value!r}, {self.line}:{self.col})'
+
+
+def tokenize(text, filename=None, firstLine=1):
+    """ Yields the tokens in text, skipping whitespace and comments.
+        Lines and columns are both 1 based, and the last token is always an 'eof' token.
+        firstLine is the line text starts on, if it's only part of a file.
+    """
+    line = firstLine
+    lineStart = 0
+    for m in _tokenRegex.finditer(text):
+        kind = m.lastgroup
+        if kind == 'newline':
+            line += 1
+            lineStart = m.end()
+        elif kind == 'error':
+            raise error(f"Unexpected character '{m.group()}'", line, m.start() - lineStart + 1, filename, text, firstLine)
+        elif kind not in ('space', 'comment'):
+            yield Token(kind, m.group(), line, m.start() - lineStart + 1)
+    yield Token('eof', '', line, len(text) - lineStart + 1)
+
+
+def matchBraces(tokens, filename=None, text=None, firstLine=1) -> "{open index: close index}":
+    """ Pairs up every '{' token with its '}' in a single pass with a stack """
+    pairs = {}
+    opened = []
+    for cnt, tok in enumerate(tokens):
+        if tok.type != 'op':
+            continue
+        if tok.value == '{':
+            opened.append(cnt)
+        elif tok.value == '}':
+            if not opened:
+                raise error("Unmatched '}'", tok.line, tok.col, filename, text, firstLine)
+            pairs[opened.pop()] = cnt
+    if opened:
+        tok = tokens[opened[-1]]
+        raise error(f'No closing brace found matching the opening brace on line {tok.line}', tok.line, tok.col, filename, text, firstLine)
+    return pairs
+
+
+def error(msg, line, col, filename=None, text=None, firstLine=1):
+    """ Makes a SyntaxError that points at a specific place in the source. text starts on firstLine. """
+    sourceLine = text.splitlines()[line - firstLine] if text and 0 <= line - firstLine < len(text.splitlines()) else None
+    return SyntaxError(f'{msg} (line {line}, column {col})', (filename, line, col, sourceLine))
+
+
+################################### Syntax Tree ###################################
+class Node:
+    """ The base of all the syntax tree nodes. Every node knows where in the source it came from.
+        Statements also have endLine and endCol, which point just past their last character.
+    """
+    fields = ()
+
+    def __init__(self, *args, line=0, col=0):
+        for name, val in zip(self.fields, args):
+            setattr(self, name, val)
+        self.line = line
+        self.col  = col
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(repr(getattr(self, i)) for i in self.fields)})'
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, i) == getattr(other, i) for i in self.fields)
+
+class Program(Node):   fields = ('body',)
+class Assign(Node):    fields = ('target', 'value')
+class Call(Node):      fields = ('name', 'args', 'kwargs')
+class Name(Node):      fields = ('id',)
+class Number(Node):    fields = ('value',)
+class String(Node):    fields = ('value',)
+class Condition(Node): fields = ('left', 'op', 'right')
+class While(Node):     fields = ('condition', 'body')
+class DoWhile(Node):   fields = ('condition', 'body')
+class If(Node):        fields = ('condition', 'body')
+
+blocks = (While, DoWhile, If)
+
+
+################################### Parser ###################################
+class Parser:
+    """ A recursive descent parser for .emc programs. Blocks are the one place it doesn't
+        recurse: they're kept on an explicit stack, so deeply nested programs don't run into
+        Python's recursion limit. Grammar:
+            program    := statement*
+            statement  := block | assignment | call
+            block      := ('while' | 'dowhile' | 'if') '(' condition ')' '{' statement* '}'
+            assignment := name '=' expression
+            call       := name '(' [argument (',' argument)*] ')'
+            argument   := [name '='] expression
+            condition  := expression [comparison expression]
+            expression := call | name | ['-'] number | string
+    """
+    def __init__(self, text, filename=None, tokens=None, firstLine=1):
+        """ tokens can be given if text has already been tokenized. text starts on firstLine. """
+        self.text = text
+        self.filename = filename
+        self.firstLine = firstLine
+        self.tokens = list(tokenize(text, filename, firstLine)) if tokens is None else tokens
+        self.braces = matchBraces(self.tokens, filename, text, firstLine)
+        self.pos = 0
+
+    # Helpers
+    @property
+    def current(self):
+        return self.tokens[self.pos]
+
+    def peek(self, ahead=1):
+        return self.tokens[min(self.pos + ahead, len(self.tokens) - 1)]
+
+    def advance(self):
+        tok = self.tokens[self.pos]
+        if tok.type != 'eof':
+            self.pos += 1
+        return tok
+
+    def check(self, value):
+        return self.current.type in ('op', 'name') and self.current.value == value
+
+    def expect(self, value, why=None):
+        if not self.check(value):
+            raise self.error(why or f"Expected '{value}', but got {self.describe(self.current)}")
+        return self.advance()
+
+    def describe(self, tok):
+        return 'the end of the file' if tok.type == 'eof' else f"'{tok.value}'"
+
+    def error(self, msg, tok=None):
+        tok = tok or self.current
+        return error(msg, tok.line, tok.col, self.filename, self.text, self.firstLine)
+
+    # Grammar rules
+    def parseProgram(self):
+        program = Program([], line=1, col=1)
+        # The blocks we're inside of. The braces are already known to match, so a '}' always closes the top one.
+        opened = [program]
+        while self.current.type != 'eof':
+            if self.check('}'):
+                self.advance()
+                opened.pop()
+                continue
+            statement = self.parseStatement()
+            opened[-1].body.append(statement)
+            if isinstance(statement, blocks):
+                opened.append(statement)
+            else:
+                last = self.tokens[self.pos - 1]
+                statement.endLine, statement.endCol = last.line, last.col + len(last.value)
+        return program
+
+    def parseStatement(self):
+        """ Parses a single statement. Blocks are returned with an empty body, which the caller fills in. """
+        tok = self.current
+        if tok.type != 'name':
+            raise self.error(f'Expected a statement, but got {self.describe(tok)}')
+        if tok.value in keywords:
+            return self.parseBlock()
+        if self.peek().type == 'op' and self.peek().value == '=':
+            return self.parseAssignment()
+        if self.peek().type == 'op' and self.peek().value == '(':
+            return self.parseCall()
+        raise self.error(f"Expected '=' or '(' after '{tok.value}'", self.peek())
+
+    def parseBlock(self):
+        """ Parses the header of a block, up to and including the '{' """
+        tok = self.advance()
+        if tok.value == 'else':
+            raise self.error('else statements are currently unimplemented', tok)
+
+        self.expect('(', f"Expected '(' after {tok.value}")
+        condition = self.parseCondition()
+        self.expect(')', f"Missing ')' at the end of the {tok.value} condition")
+        self.expect('{', f"Missing '{{' at the end of the {tok.value} statement on line {tok.line}")
+
+        node = {'while': While, 'dowhile': DoWhile, 'if': If}[tok.value](condition, [], line=tok.line, col=tok.col)
+        closing = self.tokens[self.braces[self.pos - 1]]
+        node.endLine, node.endCol = closing.line, closing.col + 1
+        return node
+
+    def parseAssignment(self):
+        target = self.advance()
+        self.advance()
+        return Assign(target.value, self.parseExpression(), line=target.line, col=target.col)
+
+    def parseCall(self):
+        name = self.advance()
+        self.expect('(')
+        args, kwargs = [], []
+        while not self.check(')'):
+            if self.current.type == 'name' and self.peek().type == 'op' and self.peek().value == '=':
+                key = self.advance().value
+                self.advance()
+                kwargs.append((key, self.parseExpression()))
+            elif kwargs:
+                raise self.error('Positional parameters have to come before keyword parameters')
+            else:
+                args.append(self.parseExpression())
+            if not self.check(')'):
+                self.expect(',', f"Expected ',' or ')' in the parameters to {name.value}(), but got {self.describe(self.current)}")
+        self.advance()
+        return Call(name.value, args, kwargs, line=name.line, col=name.col)
+
+    def parseCondition(self):
+        tok = self.current
+        left = self.parseExpression()
+        if self.current.type == 'op' and self.current.value in comparisons:
+            op = self.advance().value
+            return Condition(left, op, self.parseExpression(), line=tok.line, col=tok.col)
+        return Condition(left, None, None, line=tok.line, col=tok.col)
+
+    def parseExpression(self):
+        tok = self.current
+        if tok.type == 'name' and tok.value not in keywords:
+            if self.peek().type == 'op' and self.peek().value == '(':
+                return self.parseCall()
+            self.advance()
+            return Name(tok.value, line=tok.line, col=tok.col)
+        if tok.type == 'number':
+            self.advance()
+            return Number(tok.value, line=tok.line, col=tok.col)
+        if tok.type == 'op' and tok.value == '-' and self.peek().type == 'number':
+            self.advance()
+            return Number('-' + self.advance().value, line=tok.line, col=tok.col)
+        if tok.type == 'string':
+            self.advance()
+            return String(tok.value[1:-1], line=tok.line, col=tok.col)
+        raise self.error(f'Expected a value, but got {self.describe(tok)}')
+
+
+def parse(text, filename=None) -> Program:
+    """ Parses the text of an .emc program into a Program node """
+    return Parser(text, filename).parseProgram()
+
+def _parseStatements(lines, tokens, firstLine, filename=None, partial=False):
+    """ Parses the top level statements in some tokens for parseStream(). If partial is set and they
+        end in the middle of a statement, returns None instead of raising a SyntaxError.
+    """
+    last = tokens[-1]
+    eof = Token('eof', '', last.line, last.col + len(last.value))
+    try:
+        return Parser('\n'.join(lines), filename, tokens + [eof], firstLine).parseProgram().body
+    except SyntaxError as err:
+        if partial and (err.lineno, err.offset) == (eof.line, eof.col):
+            return None
+        raise
+
+def parseStream(lines, filename=None) -> "iterator of top level statements":
+    """ Parses an .emc program from an iterable of lines (like an open file), yielding each top
+        level statement as soon as it's been read. Only the lines of the statement currently being
+        parsed are kept in memory, so the biggest block is as much of the program as is ever held at once.
+    """
+    pending, pendingLines = [], []
+    firstLine = 1
+    # How many brackets and braces are open in pending
+    depth = 0
+    for lineno, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        tokens = list(tokenize(line, filename, lineno))[:-1]
+        if not tokens:
+            if pending:
+                pendingLines.append(line)
+            continue
+
+        # Statements always start with a name, so if this line does, and everything before it is
+        # closed and parses by itself, then everything before it is finished
+        if pending and depth == 0 and tokens[0].type == 'name':
+            statements = _parseStatements(pendingLines, pending, firstLine, filename, partial=True)
+            if statements is not None:
+                yield from statements
+                pending, pendingLines = [], []
+
+        if not pending:
+            firstLine = lineno
+        pending += tokens
+        pendingLines.append(line)
+        for tok in tokens:
+            if tok.type == 'op' and tok.value in ('(', '{'):
+                depth += 1
+            elif tok.type == 'op' and tok.value in (')', '}'):
+                depth -= 1
+
+    if pending:
+        yield from _parseStatements(pendingLines, pending, firstLine, filename)
@@ -1,156 +1,556 @@
-from enum import Enum, auto
-from EasyRegex import *
-import re
+""" mindustryCompiler
+Compiles Easy Mindustry Code (.emc) programs into Mindustry processor instructions.
+Use compileSource() or compileFile() to compile from Python, or run this file to use it from the command line.
+"""
+__version__ = '1.0.0'
+
+# Only import what compiling needs here: this runs on every save from editor hooks, so startup time matters.
+# clipboard and the process pool are imported where they're used.
+import sys
 import argparse
-import clipboard
-from Cope import *
-_print = print
-_set = set
-_range = range
-_type = type
-from namespace import *
-from customNamespace import *
+from contextlib import contextmanager
+from functools import partial
+from glob import glob
+from importlib import reload
+from os import cpu_count, makedirs, stat, walk
+from os.path import basename, dirname, isdir, join, relpath, splitext
+from time import perf_counter, sleep
+import mlog
+from mlog import Label
+import namespace
+import customNamespace
+from emcParser import *
+import compileCache
+from compileCache import CompileCache
+from optimizer import levels, optimize, size
+
+# How many bytes --stream buffers before writing to the output file
+STREAM_BUFFER = 1024 * 1024
 
 description = 'A compiler that compiles a functional programming language into mindustry instructions'
 
-parser = argparse.ArgumentParser(description=description)
-parser.add_argument('inputFile',  help='The program file')
-parser.add_argument('-o', '--outfile', help='Output to a file instead of printing and copying', nargs=1, default=None)
-args = parser.parse_args()
+def loadNamespaces(reloadModules=False):
+    """ Collects everything the namespaces define that a program can call, and the named constants it can use.
+        If reloadModules is set, namespace.py and customNamespace.py are reloaded from disk first.
+    """
+    global emitters, constants, jump
+    if reloadModules:
+        reload(namespace)
+        reload(customNamespace)
+        compileCache.resetFingerprint()
+    emitters  = {name: val for name, val in vars(customNamespace).items()
+                 if callable(val) and getattr(val, '__module__', None) in ('namespace', 'customNamespace')}
+    constants = {name: val for name, val in vars(customNamespace).items()
+                 if type(val) is str and not name.startswith('_')}
+    jump = emitters['jump']
+loadNamespaces()
+
+def evaluate(node):
+    """ Turns an expression node into the value that gets passed to the emitters.
+        Names that aren't constants are Mindustry variables, so they just become their own name.
+    """
+    if isinstance(node, Name):
+        if node.id in ('True', 'False'):
+            return node.id == 'True'
+        return constants.get(node.id, node.id)
+    elif isinstance(node, (Number, String)):
+        return node.value
+    elif isinstance(node, Call):
+        return emit(node)
+    else:
+        raise error(f"Can't use {node} as a value", node.line, node.col)
 
-outfile = args.outfile
-infile  = args.inputFile
+def emit(call):
+    """ Calls the namespace function a call node refers to """
+    if call.name not in emitters:
+        raise error(f"'{call.name}' is not a known function", call.line, call.col)
+    try:
+        return emitters[call.name](*[evaluate(i) for i in call.args], **{key: evaluate(val) for key, val in call.kwargs})
+    except SyntaxError:
+        raise
+    except Exception as err:
+        raise error(f'{call.name}(): {err}', call.line, call.col)
 
-with open(infile, 'r') as f:
-    inputProgram = f.read()
+def condition(node) -> "[comparison, a, b]":
+    """ Turns a Condition node into the comparison and operands a jump takes """
+    def operand(node):
+        if isinstance(node, Call):
+            raise error(f"Can't use {node.name}() in a condition", node.line, node.col)
+        value = evaluate(node)
+        # mlog spells booleans in lowercase
+        return str(value).lower() if type(value) is bool else value
 
-keywords = ("while", "if", "else", "do")
+    left = operand(node.left)
+    if node.op is None:
+        return ['always'] if left == 'true' else ['equal', left, 'true']
+    return [namespace.ops[node.op], left, operand(node.right)]
 
+def generate(statements) -> "[Instruction], with Labels where the jumps go":
+    """ Generates the instructions for a list of statements. Nested blocks are walked with an
+        explicit stack rather than recursion, so this is linear no matter how deep the nesting goes.
+    """
+    lines = []
+    # The Labels that go before each instruction, by index. They're spliced in at the end, so they
+    # don't throw off the indexes relative jumps from the namespace functions count with.
+    marks = {}
+    # The indexes of jumps namespace functions gave a relative offset to instead of a Label
+    relative = []
 
-erEquals = group(word()) + ifNotPrecededBy('if') + optional(whitespace()) + match('=') + ifNotFollowedBy('=') + optional(whitespace()) + group(chunk())
-# debug(re.search(erEquals.str(), inputProgram).groups())
-inputProgram = re.sub(erEquals.str(), r'set(\g<1>, \g<4>)', inputProgram)
+    def place(label):
+        marks.setdefault(len(lines), []).append(label)
 
-# debug(inputProgram)
-# exit(0)
+    def add(emitted):
+        for i in mlog.instructions(emitted):
+            if isinstance(i, Label):
+                place(i)
+                continue
+            if i.op == 'jump' and i.args and mlog.isOffset(i.args[0]):
+                relative.append(len(lines))
+            lines.append(i)
 
-# Replace and with _and
-inputProgram = re.sub(' and ', ' _and ', inputProgram)
-# inputProgram = re.sub('True', 'true', inputProgram)
+    # (block, the statements in it we haven't generated yet, the block's labels)
+    stack = [(None, iter(statements), ())]
+    while stack:
+        block, body, labels = stack[-1]
+        s = next(body, None)
 
-program = inputProgram.strip().splitlines()
+        # We've reached the closing brace of the current block
+        if s is None:
+            stack.pop()
+            if isinstance(block, While):
+                top, test = labels
+                place(test)
+                lines.append(mlog.Instruction('jump', top.name, *condition(block.condition)))
+            elif isinstance(block, DoWhile):
+                top, = labels
+                lines.append(mlog.Instruction('jump', top.name, *condition(block.condition)))
+            elif isinstance(block, If):
+                end, = labels
+                place(end)
 
-def searchForClosingBrace(startingLine) -> "distance":
-    for cnt, i in enumerate(program[startingLine:]):
-        if i.strip() == '}':
-            return cnt
-    raise SyntaxError(f'No closing brace found matching the opening brace on line {startingLine + 1}')
+        elif isinstance(s, While):
+            top, test = Label(), Label()
+            lines.append(jump(test, 'true'))
+            place(top)
+            stack.append((s, iter(s.body), (top, test)))
 
-# Replace keywords
-for lineno, line in enumerate(program):
-    line = line.strip()
+        elif isinstance(s, DoWhile):
+            top = Label()
+            place(top)
+            stack.append((s, iter(s.body), (top,)))
 
-    # Remove all extrenous whitespace
-    program[lineno] = line
+        elif isinstance(s, If):
+            end = Label()
+            cond = condition(s.condition)
+            # Jump past the body if the condition is false, so only one jump runs either way
+            if cond[0] in namespace.negations:
+                lines.append(mlog.Instruction('jump', end.name, namespace.negations[cond[0]], *cond[1:]))
+            # Some conditions (like ===) don't have an opposite in mlog, so jump over the jump past the body
+            else:
+                then = Label()
+                lines.append(mlog.Instruction('jump', then.name, *cond))
+                lines.append(jump(end, 'true'))
+                place(then)
+            stack.append((s, iter(s.body), (end,)))
 
-    # First take out the comments
-    if line.startswith('#'):
-        program[lineno] = ''
-        continue
+        elif isinstance(s, Assign):
+            if isinstance(s.value, Call):
+                raise error(f"Can't assign the result of {s.value.name}() to a variable", s.line, s.col)
+            add(emitters['set'](constants.get(s.target, s.target), evaluate(s.value)))
 
-    foundKeyword = re.match(matchMax(anyOf(*keywords)).str(), line)
-    if foundKeyword:
-        keyword = foundKeyword.group().strip()
-    else:
-        continue
+        elif isinstance(s, Call):
+            add(emit(s))
 
-    if keyword == 'while':
-        erCondition = match('while') + optional(whitechunk()) + '\(' + group(chunk()) + '\)' + optional(whitechunk()) + '{'
-        condition = re.search(erCondition.str(), line).groups()[1]
-        if not condition:
-            raise SyntaxError(f"Missing '{{' at the end of line {lineno + 1}")
+    # Give relative jumps a Label to go to instead, as long as they point somewhere in these statements
+    for cnt in relative:
+        target = cnt + int(lines[cnt].args[0])
+        if 0 <= target <= len(lines):
+            if target not in marks:
+                marks[target] = [Label()]
+            lines[cnt] = mlog.Instruction('jump', marks[target][0].name, *lines[cnt].args[1:])
+
+    program = []
+    for cnt, i in enumerate(lines):
+        if cnt in marks:
+            program += marks[cnt]
+        program.append(i)
+    program += marks.get(len(lines), ())
+    return program
+
+def resolveLabels(program, start=0) -> "[Instruction]":
+    """ Takes the Labels out of a program, and points the jumps to them at the index of the instruction
+        after them. This runs once, after everything else, so nothing before it has to care where things are.
+        start is the index the program starts at, if it's only part of one.
+    """
+    addresses = {}
+    lines = []
+    for i in program:
+        if isinstance(i, Label):
+            addresses[i.name] = start + len(lines)
         else:
-            closing = searchForClosingBrace(lineno)
-            program[lineno] = f"jump({closing}, 'true')"
-            program[closing + lineno] = f"jump({-(closing - 1)}, '{condition}')"
-
-    if keyword == 'dowhile':
-        # raise SyntaxError(f"Error: do statement at line {lineno + 1}. do statements are currently unimplemented.")
-        erCondition = match('while') + optional(whitechunk()) + '\(' + group(chunk()) + '\)' + optional(whitechunk()) + '{'
-        condition = re.search(erCondition.str(), line).groups()[1]
-        if not condition:
-            raise SyntaxError(f"Missing '{{' at the end of line {lineno + 1}")
+            lines.append(i)
+
+    for cnt, i in enumerate(lines):
+        if i.op != 'jump':
+            continue
+        target = i.args[0] if i.args else ''
+        if target in addresses:
+            lines[cnt] = mlog.Instruction('jump', addresses[target], *i.args[1:])
+        elif mlog.isOffset(target):
+            # A relative jump that goes outside of the program, so generate() couldn't give it a Label
+            lines[cnt] = mlog.Instruction('jump', start + cnt + int(target), *i.args[1:])
         else:
-            closing = searchForClosingBrace(lineno)
-            program[lineno] = ""
-            program[closing + lineno] = f"jump({-(closing - 1)}, '{condition}')"
-
-    if keyword == 'if':
-        erCondition = match('if (') + group(chunk()) + '\){'
-        condition = re.search(erCondition.str(), line)
-        if not condition:
-            raise SyntaxError(f"Missing '{{' at the end of line {lineno + 1}")
+            raise SyntaxError(f"Can't find where '{i}' jumps to")
+    return lines
+
+
+################################### API ###################################
+class CompileOptions:
+    """ Settings for a single compile
+        filename: What to call the program in error messages
+        optimize: The optimization level (see optimizer.levels), 0 turns optimizing off
+    """
+    def __init__(self, filename=None, optimize=1):
+        self.filename = filename
+        self.optimize = optimize
+
+    def cacheKey(self) -> str:
+        """ Everything in here that can change the output (which the filename can't) """
+        return repr(sorted((key, val) for key, val in vars(self).items() if key != 'filename'))
+
+class CompileResult:
+    """ The finished output of a compile. str() of it is the mlog text.
+        Results loaded from the cache only have the text, so the instructions are parsed from it if they're asked for.
+        saved is how many instructions optimizing took out, or None if it's not known (because it came from the cache).
+    """
+    def __init__(self, instructions=None, filename=None, cached=False, output=None, saved=None):
+        self._instructions = instructions
+        self._output = output
+        self.filename = filename
+        self.cached = cached
+        self.saved = saved
+
+    @property
+    def instructions(self) -> "[Instruction]":
+        if self._instructions is None:
+            self._instructions = mlog.parse(self._output)
+        return self._instructions
+
+    @property
+    def output(self) -> str:
+        if self._output is None:
+            self._output = mlog.serialize(self._instructions)
+        return self._output
+
+    @property
+    def lines(self) -> "[str]":
+        return self.output.split('\n') if self.output else []
+
+    def __len__(self):
+        return len(self.instructions) if self._output is None else len(self.lines)
+
+    def __str__(self):
+        return self.output
+
+def compileSource(text, options=None, cache=None, profile=None) -> CompileResult:
+    """ Compiles the text of an .emc program. Raises SyntaxError if the program is invalid.
+        If a CompileCache is given, the output is looked up in and saved to it.
+        If a CompileProfile is given, each stage of the compile is measured with it.
+    """
+    stage = profile.stage if profile is not None else _noStage
+    options = options or CompileOptions()
+    if cache is not None:
+        key = cache.key(text, __version__, options.cacheKey())
+        output = cache.get(key)
+        if output is not None:
+            return CompileResult(filename=options.filename, cached=True, output=output)
+
+    try:
+        with stage('parse'):
+            tree = parse(text, options.filename)
+        with stage('generate'):
+            generated = generate(tree.body)
+        # Free each stage's input between stages, so it doesn't count against the next stage's memory
+        del tree
+        with stage('optimize'):
+            unresolved = optimize(generated, options.optimize)
+            saved = size(generated) - size(unresolved)
+        del generated
+        with stage('resolve'):
+            program = resolveLabels(unresolved)
+        del unresolved
+    except SyntaxError as err:
+        # Errors from the code generation don't know which file or line of text they came from
+        if err.filename is None:
+            err.filename = options.filename
+        if err.text is None and err.lineno and err.lineno <= len(text.splitlines()):
+            err.text = text.splitlines()[err.lineno - 1]
+        raise
+
+    result = CompileResult(program, options.filename, saved=saved)
+    if cache is not None:
+        cache.put(key, result.output)
+    return result
+
+def compileStream(lines, out, options=None) -> "number of instructions written":
+    """ Compiles an .emc program from an iterable of lines (like an open file), writing the
+        instructions to the file-like out as it goes. Only one top level statement is compiled at a
+        time, so memory use depends on the size of the biggest block, not the size of the program.
+        The output is the same as compileSource()'s, except that each statement is optimized on its own
+        (so nothing that needs to see the whole program is done), and it doesn't use the cache.
+    """
+    options = options or CompileOptions()
+    written = 0
+    try:
+        for statement in parseStream(lines, options.filename):
+            for i in resolveLabels(optimize(generate([statement]), options.optimize, partial=True), written):
+                out.write(f'\n{i}' if written else str(i))
+                written += 1
+    except SyntaxError as err:
+        if err.filename is None:
+            err.filename = options.filename
+        raise
+    return written
+
+def compileFile(path, options=None, cache=None) -> CompileResult:
+    """ Compiles the .emc program at path """
+    options = options or CompileOptions(path)
+    if options.filename is None:
+        options.filename = path
+    with open(path, 'r') as f:
+        return compileSource(f.read(), options, cache)
+
+def profileFile(path, options=None, callsFile=None) -> "(CompileResult, CompileProfile)":
+    """ Compiles the .emc program at path several times, measuring how long each stage takes and
+        how much memory it allocates. If callsFile is given, a cProfile dump of a compile is saved to it.
+        Never uses the cache, since that would skip everything worth measuring.
+    """
+    from compileProfile import CompileProfile
+    options = options or CompileOptions(path)
+    if options.filename is None:
+        options.filename = path
+    profile = CompileProfile()
+
+    def run():
+        with profile.stage('read'):
+            with open(path, 'r') as f:
+                text = f.read()
+        result = compileSource(text, options, profile=profile)
+        with profile.stage('serialize'):
+            result.output
+        return result
+
+    result = profile.time(run)
+    profile.traceMemory(run)
+    if callsFile:
+        profile.dumpCalls(run, callsFile)
+    return result, profile
+
+@contextmanager
+def _noStage(name):
+    yield
+
+
+################################### Batch Builds ###################################
+def _buildJob(path, cache=None, optimize=1) -> "(path, output or None, error or None, seconds, cached, saved)":
+    """ Compiles a single file for build(). This runs in the worker processes, so it has to be picklable. """
+    start = perf_counter()
+    try:
+        result = compileFile(path, CompileOptions(path, optimize), cache)
+    except (SyntaxError, OSError) as err:
+        return path, None, err, perf_counter() - start, False, None
+    return path, result.output, None, perf_counter() - start, result.cached, result.saved
+
+def findSources(sources, outDir=None, extension='.mlog') -> "{source file: output file}":
+    """ Finds all the .emc files in sources (files or directories, which are searched recursively),
+        and where their output goes in outDir, keeping the directory structure
+    """
+    files = {}
+    for source in sources:
+        if isdir(source):
+            for path in sorted(glob(join(source, '**', '*.emc'), recursive=True)):
+                files[path] = join(outDir or '', splitext(relpath(path, source))[0] + extension)
         else:
-            closing = searchForClosingBrace(lineno)
-            program[lineno] = f"jump(2, '{condition.groups()[0]}')"
-            program.insert(lineno + 1, f'jump({closing}, true)')
-            program[closing + lineno + 1] = ''
-
-    if keyword == 'else':
-        raise SyntaxError(f"Error: else statement at line {lineno + 1}. else statements are currently unimplemented.")
-
-
-# Go through and run each line as python code, with a couple of additions
-outputProgram = ''
-_locals = locals()
-code = ''
-for i in program:
-    if i == '':
-        continue
+            files[source] = join(outDir or '', splitext(basename(source))[0] + extension)
+    return files
+
+def build(sources, outDir, jobs=None, extension='.mlog', cache=None, optimize=1) -> "number of files that failed":
+    """ Compiles every .emc file in sources (files or directories, which are searched recursively)
+        into outDir, keeping the directory structure. Files are spread across a pool of jobs processes.
+        optimize is the optimization level.
+    """
+    files = findSources(sources, outDir, extension)
+    start = perf_counter()
+    jobs = jobs or cpu_count() or 1
+    if jobs == 1 or len(files) <= 1:
+        results = list(map(partial(_buildJob, cache=cache, optimize=optimize), files))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(jobs, len(files))) as pool:
+            results = list(pool.map(partial(_buildJob, cache=cache, optimize=optimize), files, chunksize=max(1, len(files) // (jobs * 4))))
+
+    failed = 0
+    maxName = max((len(i) for i in files), default=0)
+    for path, output, err, seconds, cached, saved in results:
+        if err is not None:
+            failed += 1
+            print(f'{path:<{maxName}} failed: {err}', file=sys.stderr)
+            continue
+        makedirs(dirname(files[path]) or '.', exist_ok=True)
+        with open(files[path], 'w') as f:
+            f.write(output)
+        print(f'{path:<{maxName}} took {seconds:.5f} seconds to {"load from the cache" if cached else "compile"} '
+              f'({len(output.splitlines())} instructions{f", {saved} optimized away" if saved else ""})')
+    print(f'Built {len(files) - failed} of {len(files)} files in {perf_counter() - start:.5f} seconds using {jobs} jobs')
+    return failed
+
+
+################################### Watching ###################################
+def _mtime(path):
     try:
-        try:
-            line = 'outputProgram = outputProgram + ' + i + ' + "\\n"'
-            exec(line, globals(), _locals)
-        #* This is SO hacky, but I LOVE it.
-        except NameError as err:
-            erParseError = match("'") + group(word()) + match("'")
-            foundName = re.search(erParseError.str(), str(err))
-            if foundName:
-                var = foundName.groups()[0]
-                varLine = f'{var} = "{var}"; '
+        return stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _directoryTimes(sources) -> "{directory: when it last changed} for the directories in sources, and every one under them":
+    """ A directory changes whenever a file in it is added, removed, or renamed, so watch() only has to
+        look for new sources when one of these does
+    """
+    times = {}
+    for source in sources:
+        if isdir(source):
+            # Like the glob in findSources, follow links to other directories
+            for path, _, _ in walk(source, followlinks=True):
+                times[path] = _mtime(path)
+    return times
+
+def watch(sources, outDir=None, outfile=None, interval=.05, extension='.mlog', optimize=1):
+    """ Stays running, and recompiles whichever of sources change whenever they're saved.
+        sources can be files or directories, like build(). Editing namespace.py or customNamespace.py
+        reloads them and recompiles everything.
+        Each output is written into outDir, or to outfile if there's only one source,
+        or copied to the clipboard if neither are given. optimize is the optimization level.
+    """
+    namespaceFiles = [namespace.__file__, customNamespace.__file__]
+    namespaceTimes = [_mtime(i) for i in namespaceFiles]
+    times = {}
+    directories = files = None
+    print(f'Watching {", ".join(sources)} for changes. Press Ctrl+C to stop.')
+    try:
+        while True:
+            current = [_mtime(i) for i in namespaceFiles]
+            everything = current != namespaceTimes
+            if everything:
+                namespaceTimes = current
                 try:
-                    exec(varLine + line, globals(), _locals)
-                except NameError as err2:
-                    erParseError = match("'") + group(word()) + match("'")
-                    foundName = re.search(erParseError.str(), str(err2))
-                    if foundName:
-                        var = foundName.groups()[0]
-                        varLine = f'{var} = "{var}"; '
-                    else:
-                        raise err2
+                    loadNamespaces(True)
+                except Exception as err:
+                    print(f"Couldn't reload the namespaces: {err}", file=sys.stderr)
+
+            # Searching the directories again every time would be slow on big trees
+            if files is None or any(_mtime(i) != mtime for i, mtime in directories.items()):
+                directories = _directoryTimes(sources)
+                files = findSources(sources, outDir, extension)
+            for path, outPath in files.items():
+                mtime = _mtime(path)
+                if mtime is None or (mtime == times.get(path) and not everything):
+                    continue
+                times[path] = mtime
+
+                start = perf_counter()
+                try:
+                    out = compileFile(path, CompileOptions(path, optimize)).output
+                except (SyntaxError, OSError) as err:
+                    print(f'{path} failed: {err}', file=sys.stderr)
+                    continue
+
+                if outDir:
+                    makedirs(dirname(outPath) or '.', exist_ok=True)
+                if outDir or outfile:
+                    with open(outPath if outDir else outfile, 'w') as f:
+                        f.write(out)
+                else:
+                    import clipboard
+                    clipboard.copy(out)
+                print(f'Compiled {path} in {(perf_counter() - start) * 1000:.2f}ms ({len(out.splitlines())} instructions)')
+
+            # Forget about files that have been deleted
+            for path in times.keys() - files.keys():
+                del times[path]
+            sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+################################### Command Line ###################################
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == 'build':
+        parser = argparse.ArgumentParser(prog='mindustryCompiler.py build', description='Compile a lot of programs at once')
+        parser.add_argument('sources', nargs='+', help='The .emc files, or directories of them, to compile')
+        parser.add_argument('-o', '--outdir', required=True, help='The directory to put the compiled programs in')
+        parser.add_argument('-j', '--jobs', type=int, default=None, help='How many processes to compile with (defaults to the number of cores)')
+        parser.add_argument('--no-cache', action='store_true', help="Don't use or update the compile cache")
+        parser.add_argument('-w', '--watch', action='store_true', help='Keep running, and recompile files whenever they change')
+        parser.add_argument('-O', dest='optimize', type=int, default=1, choices=sorted(levels), metavar='LEVEL', help='How much to optimize the output: -O0 for not at all, -O1 (the default) for peephole optimizations, folding constants, and taking out dead code')
+        args = parser.parse_args(argv[1:])
+        if args.watch:
+            return watch(args.sources, outDir=args.outdir, optimize=args.optimize)
+        sys.exit(1 if build(args.sources, args.outdir, args.jobs, cache=None if args.no_cache else CompileCache(), optimize=args.optimize) else 0)
+
+    parser = argparse.ArgumentParser(description=description, epilog='Use "build <sources> -o <outdir>" to compile many files at once')
+    parser.add_argument('inputFile',  help='The program file')
+    parser.add_argument('-o', '--outfile', help='Output to a file instead of printing and copying', default=None)
+    parser.add_argument('--no-cache', action='store_true', help="Don't use or update the compile cache")
+    parser.add_argument('-w', '--watch', action='store_true', help='Keep running, and recompile the file whenever it changes')
+    parser.add_argument('--stream', action='store_true', help="Compile a statement at a time, without ever holding the whole program in memory. "
+                                                              "Doesn't use the cache, or copy to the clipboard.")
+    parser.add_argument('--profile', action='store_true', help="Print how long each stage of the compile takes, and how much memory it uses. "
+                                                               "Doesn't use the cache.")
+    parser.add_argument('--profile-output', default=None, metavar='FILE', help='Save a cProfile dump of the compile to FILE (implies --profile)')
+    parser.add_argument('-O', dest='optimize', type=int, default=1, choices=sorted(levels), metavar='LEVEL', help='How much to optimize the output: -O0 for not at all, -O1 (the default) for peephole optimizations, folding constants, and taking out dead code')
+    args = parser.parse_args(argv)
+    options = CompileOptions(args.inputFile, args.optimize)
+
+    if args.watch:
+        return watch([args.inputFile], outfile=args.outfile, optimize=args.optimize)
+
+    if args.profile or args.profile_output:
+        result, profile = profileFile(args.inputFile, options, callsFile=args.profile_output)
+        # stdout might be where the program's going
+        print(profile.table(), file=sys.stderr)
+        if args.profile_output:
+            print(f'Saved cProfile stats to {args.profile_output}', file=sys.stderr)
+        if args.outfile:
+            with open(args.outfile, 'w') as f:
+                f.write(result.output)
+        else:
+            print(result.output)
+        return
+
+    if args.stream:
+        with open(args.inputFile, 'r') as f:
+            if args.outfile:
+                with open(args.outfile, 'w', buffering=STREAM_BUFFER) as out:
+                    compileStream(f, out, options)
             else:
-                raise err
-    except Exception as err:
-        raise SyntaxError(f'Error on line {lineno + 1}: {err}\n"{i}" -> "{line}"')
-
-# Fix the jump statement indexes
-program = outputProgram.strip().splitlines()
-for lineno, line in enumerate(program):
-    if 'jump' not in line:
-        continue
-    erJump = optional(whitechunk()) + 'jump ' + group(optional('-') + number())
-    found = re.search(erJump.str(), line)
-    if found:
-        index = found.groups()[1]
-    else:
-        raise SyntaxError(f"Can't find a number in {line}")
-    program[lineno] = re.subn(erJump.str(), f'jump {int(index) + lineno}', line, 1)[0]
+                compileStream(f, sys.stdout, options)
+                print()
+        return
 
+    result = compileFile(args.inputFile, options, None if args.no_cache else CompileCache())
+    out = result.output
+    if result.saved:
+        # stdout might be where the program's going
+        print(f'Optimizing saved {result.saved} instruction{"" if result.saved == 1 else "s"}', file=sys.stderr)
+    if args.outfile:
+        with open(args.outfile, 'w') as f:
+            f.write(out)
+    else:
+        print(out)
+        import clipboard
+        clipboard.copy(out)
 
-out = '\n'.join(program)
-if outfile:
-    with open(outfile, 'w') as f:
-        f.write(out)
-else:
-    _print(out)
-    clipboard.copy(out)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+""" mlog
+The compiler's representation of Mindustry processor instructions. The namespace functions
+return Instructions, the compiler collects them in a list and works on them as data, and they're
+only turned into mlog text once, by serialize(), when the program is finished.
+Jumps go to Labels rather than to instruction indexes, so instructions can be added, removed, and
+moved around freely until the labels are resolved at the very end.
+"""
+from itertools import count
+from sys import intern
+
+
+class Instruction:
+    """ A single mlog instruction: an opcode (like 'op' or 'jump'), and its operands.
+        All of them are stored as interned strings, since the same few names and variables
+        come up over and over again in a program.
+    """
+    __slots__ = ('op', 'args')
+
+    def __init__(self, op, *args):
+        self.op = intern(str(op))
+        self.args = tuple(intern(str(i)) for i in args)
+
+    def __str__(self):
+        return ' '.join((self.op,) + self.args) if self.args else self.op
+
+    def __repr__(self):
+        return f'Instruction({", ".join(map(repr, (self.op,) + self.args))})'
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.op == other.op and self.args == other.args
+
+    def __hash__(self):
+        return hash((self.op, self.args))
+
+
+_labelNames = count()
+
+class Label(Instruction):
+    """ A pseudo-instruction that marks a place in the program for jumps to go to. It doesn't take
+        up any space in the finished program: jumps to it go to the instruction after it.
+        Every new Label gets its own name, unless it's given one.
+    """
+    __slots__ = ()
+
+    def __init__(self, name=None):
+        super().__init__('label', name if name is not None else f'label{next(_labelNames)}')
+
+    @property
+    def name(self):
+        return self.args[0]
+
+    def __str__(self):
+        return self.name + ':'
+
+    def __repr__(self):
+        return f'Label({self.name!r})'
+
+
+def isOffset(target) -> bool:
+    """ If a jump target is a relative offset (like -3), instead of a label """
+    return target.lstrip('-').isdigit()
+
+def parse(text) -> "[Instruction]":
+    """ Turns mlog text (one instruction per line, blank lines are ignored) into Instructions.
+        Lines like "name:" become Labels.
+    """
+    return [Label(line.strip()[:-1]) if line.strip().endswith(':') else Instruction(*line.split())
+            for line in text.splitlines() if line.strip()]
+
+def instructions(emitted) -> "[Instruction]":
+    """ Turns whatever a namespace function returned into a list of Instructions.
+        That can be a single Instruction (or Label), a list of them, or mlog text.
+    """
+    if isinstance(emitted, Instruction):
+        return [emitted]
+    if isinstance(emitted, str):
+        return parse(emitted)
+    return [i for e in emitted for i in instructions(e)]
+
+def serialize(instructions) -> str:
+    """ Turns a list of Instructions into mlog text """
+    return '\n'.join(map(str, instructions))
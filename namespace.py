@@ -1,29 +1,42 @@
-from EasyRegex import *
-from Cope import *
+from EasyRegex import anyOf, chunk, group, optional, whitechunk, word
+from mlog import Instruction, Label
 
 _print = print
 _set = set
 
+ops = {
+    '==': "equal",
+    '!=': "notEqual",
+    '<': "lessThan",
+    '<=': "lessThanEq",
+    '>': "greaterThan",
+    '>=': "greaterThanEq",
+    '===': "strictEqual",
+    'true': "always"
+}
+
+# The comparison that's true exactly when each one is false. strictEqual doesn't have one in mlog.
+negations = {
+    'equal':       'notEqual',      'notEqual':      'equal',
+    'lessThan':    'greaterThanEq', 'greaterThanEq': 'lessThan',
+    'greaterThan': 'lessThanEq',    'lessThanEq':    'greaterThan',
+}
+
+# Longest operators first, so <= doesn't get matched as <
+erCondition = group(word()) + optional(whitechunk()) + group(anyOf(*sorted(ops.keys(), key=len, reverse=True))) + optional(whitechunk()) + group(chunk())
+
 def convertCondition(string):
     string = str(string).strip()
-    ops = {
-        '==': "equal",
-        '!=': "notEqual",
-        '<': "lessThan",
-        '<=': "lessThanEq",
-        '>': "greaterThan",
-        '>=': "greaterThanEq",
-        '===': "strictEqual",
-        'true': "always"
-    }
+
+    if string in ops:
+        return ops[string]
 
     if ' ' not in string:
         return f'equal {string} true'
 
-    erParser = group(word()) + optional(whitechunk()) + group(matchMax(anyOf(*ops.keys()))) + optional(whitechunk()) + group(chunk())
-    found = re.match(erParser.str(), string)
+    found = erCondition.compile().match(string)
     if found:
-        op = ops[found.groups()[3]]
+        op = ops[found.groups()[2]]
         a  = found.groups()[0]
         b  = found.groups()[5]
     else:
@@ -42,40 +55,41 @@ unitTypes = "any", "enemy", "ally", "boss", "player", "attacking", "flying", "gr
 
 
 def read(var, memorycell, index):
-    return f"read {memorycell} {index}"
+    return Instruction('read', memorycell, index)
 
 def write(var, memorycell, index):
-    return f"write {memorycell} {index}"
+    return Instruction('write', memorycell, index)
 
 # sensor result block1 @copper
 def sensor(var, building, detect):
-    return f"sensor {var} {building} {detect}"
+    return Instruction('sensor', var, building, detect)
 
 def set(var, val):
-    return f"set {var} {val}"
+    return Instruction('set', var, val)
 
 def end():
-    return f"end"
+    return Instruction('end')
 
+# to is a Label, or how many instructions to jump forward (or backward, if it's negative)
 def jump(to, condition):
-    return f"jump {to} {convertCondition(condition)}"
+    return Instruction('jump', to.name if isinstance(to, Label) else to, *convertCondition(condition).split(' ', 2))
 
 # getlink result 0
 def getlink(var, index:int):
-    return f"getlink {var} {index}"
+    return Instruction('getlink', var, index)
 
 
 def draw(command, a=0, b=0, c=0, d=0, e=0, f=0):
-    return f"draw {command} {a} {b} {c} {d} {e} {f}"
+    return Instruction('draw', command, a, b, c, d, e, f)
 
 def drawclear(r, g, b):
-    return f"draw clear {r} {g} {b}"
+    return Instruction('draw', 'clear', r, g, b)
 
 def drawcolor(r, g, b, a):
-    return f"draw color {r} {g} {b} {a}"
+    return Instruction('draw', 'color', r, g, b, a)
 
 def drawstroke(size):
-    return f"draw stroke {size}"
+    return Instruction('draw', 'stroke', size)
 
 def drawline(x1, y1, x2, y2):
     return draw('line', x1, y1, x2, y2)
@@ -101,14 +115,14 @@ def drawimage(x, y, image, size, rotation):
     return draw('image', x, y, image, size, rotation)
 
 def drawflush(display='display1'):
-    return f"drawflush {display}"
+    return Instruction('drawflush', display)
 
 
 def print(thing):
-    return f"print {thing}"
+    return Instruction('print', thing)
 
 def printflush(building='message1'):
-    return f"printflush {building}"
+    return Instruction('printflush', building)
 
 
 # radar any enemy ally distance turret1 order var
@@ -117,10 +131,10 @@ def bradar(var, building, unitType1='any', unitType2='any', unitType3='any', pri
     options(unitType2, unitTypes)
     options(unitType3, unitTypes)
     options(prioritize, 'distance', 'health', 'shield', 'armor', 'maxHealth')
-    return f"radar {unitType1} {unitType2} {unitType3} {prioritize} {building} {'0' if unitTypeOrderReversed else '1'} {var}"
+    return Instruction('radar', unitType1, unitType2, unitType3, prioritize, building, '0' if unitTypeOrderReversed else '1', var)
 
 def bcontrol(command, building, a=0, b=0, c=0, d=0):
-    return f"control {command} {building} {a} {b} {c} {d}"
+    return Instruction('control', command, building, a, b, c, d)
 
 def bshoot(building, x, y, shots=1):
     return buildingControl('shoot', building, x, y, shots)
@@ -142,10 +156,10 @@ def bcolor(building, r, g, b):
 
 
 def add(var, a, b):
-    return f"op add {var} {a} {b}"
+    return Instruction('op', 'add', var, a, b)
 
 def sub(var, a, b):
-    return f"op sub {var} {a} {b}"
+    return Instruction('op', 'sub', var, a, b)
 
 def increment(var):
     return add(var, var, 1)
@@ -154,43 +168,43 @@ def decrement(var):
     return sub(var, var, 1)
 
 def mul(var, a, b):
-    return f"op mul {var} {a} {b}"
+    return Instruction('op', 'mul', var, a, b)
 
 def div(var, a, b):
-    return f"op div {var} {a} {b}"
+    return Instruction('op', 'div', var, a, b)
 
 def idiv(var, a, b):
-    return f"op idiv {var} {a} {b}"
+    return Instruction('op', 'idiv', var, a, b)
 
 def mod(var, a, b):
-    return f"op mod {var} {a} {b}"
+    return Instruction('op', 'mod', var, a, b)
 
 def pow(var, a, b):
-    return f"op pow {var} {a} {b}"
+    return Instruction('op', 'pow', var, a, b)
 
 def equal(var, a, b):
-    return f"op equal {var} {a} {b}"
+    return Instruction('op', 'equal', var, a, b)
 
 def notEqual(var, a, b):
-    return f"op notEqual {var} {a} {b}"
+    return Instruction('op', 'notEqual', var, a, b)
 
 def _and(var, a, b):
-    return f"op land {var} {a} {b}"
+    return Instruction('op', 'land', var, a, b)
 
 def lessThan(var, a, b):
-    return f"op lessThan {var} {a} {b}"
+    return Instruction('op', 'lessThan', var, a, b)
 
 def lessThanEq(var, a, b):
-    return f"op lessThanEq {var} {a} {b}"
+    return Instruction('op', 'lessThanEq', var, a, b)
 
 def greaterThan(var, a, b):
-    return f"op greaterThan {var} {a} {b}"
+    return Instruction('op', 'greaterThan', var, a, b)
 
 def greaterThanEq(var, a, b):
-    return f"op greaterThanEq {var} {a} {b}"
+    return Instruction('op', 'greaterThanEq', var, a, b)
 
 def strictEqual(var, a, b):
-    return f"op strictEqual {var} {a} {b}"
+    return Instruction('op', 'strictEqual', var, a, b)
 
 # op shl result a b
 # op shr result a b
@@ -199,77 +213,77 @@ def strictEqual(var, a, b):
 # op xor result a b
 # op not result a b
 def bitShiftLeft(var, a, b):
-    return f"op shl {var} {a} {b}"
+    return Instruction('op', 'shl', var, a, b)
 
 def bitShiftRight(var, a, b):
-    return f"op shr {var} {a} {b}"
+    return Instruction('op', 'shr', var, a, b)
 
 def bitor(var, a, b):
-    return f"op or {var} {a} {b}"
+    return Instruction('op', 'or', var, a, b)
 
 def bitand(var, a, b):
-    return f"op and {var} {a} {b}"
+    return Instruction('op', 'and', var, a, b)
 
 def bitxor(var, a, b):
-    return f"op xor {var} {a} {b}"
+    return Instruction('op', 'xor', var, a, b)
 
 def bitnot(var, a):
-    return f"op not {var} {a} {b}"
+    return Instruction('op', 'not', var, a, b)
 
 def max(var, a, b):
-    return f"op max {var} {a} {b}"
+    return Instruction('op', 'max', var, a, b)
 
 def min(var, a, b):
-    return f"op min {var} {a} {b}"
+    return Instruction('op', 'min', var, a, b)
 
 def angle(var, a, b):
-    return f"op angle"
+    return Instruction('op', 'angle')
 
 def vlen(var, a, b):
-    return f"op len {var} {a} {b}"
+    return Instruction('op', 'len', var, a, b)
 
 def noise(var, a, b):
-    return f"op noise {var} {a} {b}"
+    return Instruction('op', 'noise', var, a, b)
 
 def abs(var, a):
-    return f"op abs {var} {a}"
+    return Instruction('op', 'abs', var, a)
 
 def log(var, a):
-    return f"op log {var} {a}"
+    return Instruction('op', 'log', var, a)
 
 def log10(var, a):
-    return f"op log10 {var} {a}"
+    return Instruction('op', 'log10', var, a)
 
 def sin(var, a):
-    return f"op sin {var} {a}"
+    return Instruction('op', 'sin', var, a)
 
 def cos(var, a):
-    return f"op cos {var} {a}"
+    return Instruction('op', 'cos', var, a)
 
 def tan(var, a):
-    return f"op tan {var} {a}"
+    return Instruction('op', 'tan', var, a)
 
 def floor(var, a):
-    return f"op floor {var} {a}"
+    return Instruction('op', 'floor', var, a)
 
 def ceil(var, a):
-    return f"op ceil {var} {a}"
+    return Instruction('op', 'ceil', var, a)
 
 def sqrt(var, a):
-    return f"op sqrt {var} {a}"
+    return Instruction('op', 'sqrt', var, a)
 
 def rand(var, seed):
-    return f"op rand {var} {seed}"
+    return Instruction('op', 'rand', var, seed)
 
 def operation(var, op, a, b='0'):
-    return f"op {op} {var} {a} {b}"
+    return Instruction('op', op, var, a, b)
 
 
 def ubind(unitType):
-    return f"ubind {unitType}"
+    return Instruction('ubind', unitType)
 
 def ucontrol(command, a=0, b=0, c=0, d=0, e=0):
-    return f"ucontrol {command} {a} {b} {c} {d} {e}"
+    return Instruction('ucontrol', command, a, b, c, d, e)
 
 def uidle():
     return unitControl('idle')
@@ -330,28 +344,28 @@ def uradar(var, unitType1='any', unitType2='any', unitType3='any', prioritize='d
     options(unitType2, unitTypes)
     options(unitType3, unitTypes)
     options(prioritize, 'distance', 'health', 'shield', 'armor', 'maxHealth')
-    return f"radar {unitType1} {unitType2} {unitType3} {prioritize} 0 {'0' if unitTypeOrderReversed else '1'} {var}"
+    return Instruction('radar', unitType1, unitType2, unitType3, prioritize, '0', '0' if unitTypeOrderReversed else '1', var)
 
 # ulocate ore core true @copper outx outy found building
 def ulocate(command, a, b, c, d, e, f, g):
-    return f"ulocate {command} {a} {b} {c} {d} {e} {f} {g}"
+    return Instruction('ulocate', command, a, b, c, d, e, f, g)
 
 # ulocate ore core true @copper outx outy found building
 def ulocateore(ore, xvar, yvar, foundVar):
-    return f"ulocate ore 0 0 {ore} {xvar} {yvar} {foundVar} 0"
+    return Instruction('ulocate', 'ore', '0', '0', ore, xvar, yvar, foundVar, '0')
 
 # ulocate building core isEnemy @copper outx outy found var
 def ulocatebuilding(type, isEnemy, xvar, yvar, foundVar, buildingVar):
     options(type, 'core', 'storage', 'generator', 'turret', 'factory', 'repair', 'rally', 'battery', 'resupply', 'reactor')
-    return f"ulocate building {type} {'1' if isEnemy else 0} 0 {xvar} {yvar} {foundVar} {buildingVar}"
+    return Instruction('ulocate', 'building', type, '1' if isEnemy else 0, '0', xvar, yvar, foundVar, buildingVar)
 
 # ulocate spawn core isEnemy @copper outx outy found var
 def ulocatespawn(xvar, yvar, foundVar, buildingVar):
-    return f"ulocate spawn 0 0 0 {xvar} {yvar} {foundVar} {buildingVar}"
+    return Instruction('ulocate', 'spawn', '0', '0', '0', xvar, yvar, foundVar, buildingVar)
 
 # ulocate damaged core isEnemy @copper outx outy found var
 def ulocatedamaged(xvar, yvar, foundVar, buildingVar):
-    return f"ulocate damaged 0 0 0 {xvar} {yvar} {foundVar} {buildingVar}"
+    return Instruction('ulocate', 'damaged', '0', '0', '0', xvar, yvar, foundVar, buildingVar)
 
 
 
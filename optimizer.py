@@ -0,0 +1,862 @@
+""" optimizer
+Optimizations on a generated program, before its Labels are resolved. Each peephole rule looks for
+one wasteful pattern and fixes every instance of it in a single pass over the program, and
+peephole() keeps running the rules until none of them find anything, since fixing one pattern
+often exposes another (threading a jump can leave it jumping to the very next instruction).
+"""
+import itertools
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+import mlog
+from mlog import Instruction, Label
+from namespace import negations, ops
+
+
+# The comparisons both op and jump understand
+_comparisons = frozenset(ops.values()) - {'always'}
+
+def _isUnconditional(i) -> bool:
+    return i.op == 'jump' and len(i.args) > 1 and i.args[1] == 'always'
+
+def _landsAt(program) -> "{label name: the index of the instruction a jump to it runs next}":
+    """ Where each Label actually goes, skipping over any other Labels right after it.
+        Labels at the very end land at len(program).
+    """
+    landsAt = {}
+    following = len(program)
+    for cnt in range(len(program) - 1, -1, -1):
+        if isinstance(program[cnt], Label):
+            landsAt[program[cnt].name] = following
+        else:
+            following = cnt
+    return landsAt
+
+def _nextInstruction(program, index) -> "the index of the first instruction at or after index that isn't a Label":
+    while index < len(program) and isinstance(program[index], Label):
+        index += 1
+    return index
+
+def size(program) -> int:
+    """ How many instructions a program will be, once its Labels are taken out """
+    return sum(not isinstance(i, Label) for i in program)
+
+
+################################### Peephole Rules ###################################
+# Each rule takes a program, and returns a new one if it changed anything, or None if it didn't
+
+def threadJumps(program):
+    """ A jump to an unconditional jump can go straight to where that one goes """
+    landsAt = _landsAt(program)
+    changed = False
+    threaded = []
+    for i in program:
+        if i.op == 'jump' and i.args and i.args[0] in landsAt:
+            target = i.args[0]
+            seen = {target}
+            # Follow the whole chain at once. seen stops at loops of jumps that only go to each other.
+            while landsAt[target] < len(program):
+                after = program[landsAt[target]]
+                if not _isUnconditional(after) or after.args[0] not in landsAt or after.args[0] in seen:
+                    break
+                target = after.args[0]
+                seen.add(target)
+            if target != i.args[0]:
+                i = Instruction('jump', target, *i.args[1:])
+                changed = True
+        threaded.append(i)
+    return threaded if changed else None
+
+def removeNoopJumps(program):
+    """ A jump to the instruction right after it does nothing, whatever its condition is, since
+        conditions can't have side effects
+    """
+    landsAt = _landsAt(program)
+    kept = [i for cnt, i in enumerate(program)
+            if i.op != 'jump' or not i.args or landsAt.get(i.args[0]) != _nextInstruction(program, cnt + 1)]
+    return kept if len(kept) != len(program) else None
+
+def removeUnusedLabels(program):
+    """ Labels nothing jumps to don't change the output, but they do keep instructions on either
+        side of them from looking like they're next to each other to the other rules
+    """
+    used = {i.args[0] for i in program if i.op == 'jump' and i.args}
+    kept = [i for i in program if not isinstance(i, Label) or i.name in used]
+    return kept if len(kept) != len(program) else None
+
+def invertJumpOverJump(program):
+    """ A conditional jump over an unconditional one, like the pair every if statement starts with:
+            jump then lessThan a b
+            jump end always
+            then:
+        is the same as one jump with the opposite condition: jump end greaterThanEq a b
+    """
+    landsAt = _landsAt(program)
+    inverted = []
+    skip = False
+    for cnt, i in enumerate(program):
+        if skip:
+            skip = False
+            continue
+        if (i.op == 'jump' and len(i.args) > 1 and i.args[1] in negations and cnt + 1 < len(program)
+                and _isUnconditional(program[cnt + 1]) and landsAt.get(i.args[0]) == _nextInstruction(program, cnt + 2)):
+            i = Instruction('jump', program[cnt + 1].args[0], negations[i.args[1]], *i.args[2:])
+            skip = True
+        inverted.append(i)
+    return inverted if len(inverted) != len(program) else None
+
+def fuseCompareAndJump(program):
+    """ A comparison that's only done to test it in the jump right after it:
+            op lessThan t a b
+            jump L equal t true
+        can be done by the jump itself: jump L lessThan a b
+        Only if t isn't used anywhere else, since the jump doesn't set it anymore.
+    """
+    uses = Counter(arg for i in program if not isinstance(i, Label) for arg in i.args)
+    fused = []
+    skip = False
+    for cnt, i in enumerate(program):
+        if skip:
+            skip = False
+            continue
+        if i.op == 'op' and len(i.args) == 4 and i.args[0] in _comparisons and cnt + 1 < len(program):
+            compare, result, a, b = i.args
+            test = program[cnt + 1]
+            if test.op == 'jump' and len(test.args) == 4 and uses[result] == 2 and result not in (a, b):
+                target, condition, *operands = test.args
+                # Which way round the jump tests it
+                other = operands[1] if operands[0] == result else operands[0] if operands[1] == result else None
+                if condition in ('equal', 'notEqual') and other in ('true', 'false'):
+                    if (condition == 'equal') != (other == 'true'):
+                        compare = negations.get(compare)
+                    if compare is not None:
+                        i = Instruction('jump', target, compare, a, b)
+                        skip = True
+        fused.append(i)
+    return fused if len(fused) != len(program) else None
+
+
+################################### Dead Code ###################################
+# The instructions that don't do anything but set a variable, and which of their arguments is the variable.
+# Anything else (control, ucontrol, write, print, draw, and everything else) is always kept.
+_pure = {'set': 0, 'op': 1, 'sensor': 0, 'getlink': 0, 'read': 0}
+
+def _sets(i) -> "the variable i sets, if it's an instruction that only sets a variable":
+    index = _pure.get(i.op)
+    return i.args[index] if index is not None and len(i.args) > index else None
+
+@lru_cache(maxsize=4096)
+def _isVariable(arg) -> bool:
+    """ Built-in variables (starting with @) aren't counted, since they're never taken out anyway """
+    return not (arg[0] in '@"' or mlog.isOffset(arg.split('.', 1)[0]) or arg in ('true', 'false', 'null'))
+
+def _reads(i) -> "the variables i might read":
+    if i.op in ('op', 'jump'):
+        # The operation and where the result goes, or the label and the comparison
+        args = i.args[2:]
+    else:
+        index = _pure.get(i.op)
+        args = [arg for cnt, arg in enumerate(i.args) if cnt != index]
+    return tuple(arg for arg in args if arg and _isVariable(arg))
+
+# How many times liveness goes over a program before giving up, and treating every variable as live
+MAX_LIVENESS_PASSES = 32
+
+def _reversePostorder(edges, roots) -> "[every node]":
+    """ Depth first order over edges ({node: [the nodes it leads to]}, or a list of them), reversed so
+        every node comes before the nodes it leads to, except along edges that go back around a loop.
+        The search starts from each of roots in turn, then from any nodes those couldn't get to.
+    """
+    order = []
+    seen = set()
+    for root in itertools.chain(roots, range(len(edges))):
+        if root in seen:
+            continue
+        seen.add(root)
+        # (node, its edges we haven't gone down yet)
+        stack = [(root, iter(edges[root]))]
+        while stack:
+            node, following = stack[-1]
+            nxt = next((i for i in following if i not in seen), None)
+            if nxt is None:
+                stack.pop()
+                order.append(node)
+            else:
+                seen.add(nxt)
+                stack.append((nxt, iter(edges[nxt])))
+    return order[::-1]
+
+class ControlFlowGraph:
+    """ The basic blocks of a program, and where each of them can go next. Processors start back at
+        the top after the last instruction or an end, so the last block (and every end) leads to the first one.
+        blocks is a list of (start, stop) indexes into program.
+    """
+    def __init__(self, program):
+        self.program = program
+        self.blocks = []
+        # {label name: the block it starts}
+        self.labels = {}
+        start = 0
+        for cnt, i in enumerate(program):
+            if cnt > start and ((isinstance(i, Label) and not isinstance(program[cnt - 1], Label)) or
+                                program[cnt - 1].op in ('jump', 'end')):
+                self.blocks.append((start, cnt))
+                start = cnt
+            if isinstance(i, Label):
+                self.labels[i.name] = len(self.blocks)
+        self.blocks.append((start, len(program)))
+        self.successors = [self._successors(b) for b in range(len(self.blocks))]
+        # Each block only once, even if a conditional jump goes to the very next block
+        self.predecessors = [[] for _ in self.blocks]
+        for b, successors in enumerate(self.successors):
+            for s in dict.fromkeys(successors):
+                self.predecessors[s].append(b)
+
+    def _successors(self, b):
+        start, stop = self.blocks[b]
+        last = next((i for i in reversed(self.program[start:stop]) if not isinstance(i, Label)), None)
+        following = (b + 1) % len(self.blocks)
+        if last is None:
+            return [following]
+        if last.op == 'end':
+            return [0]
+        if last.op == 'jump':
+            if last.args[0] not in self.labels:
+                raise KeyError(last.args[0])
+            return [self.labels[last.args[0]]] if _isUnconditional(last) else [self.labels[last.args[0]], following]
+        return [following]
+
+    def reachable(self) -> "set of blocks":
+        seen = {0}
+        todo = [0]
+        while todo:
+            for s in self.successors[todo.pop()]:
+                if s not in seen:
+                    seen.add(s)
+                    todo.append(s)
+        return seen
+
+    def dominators(self) -> "[the block right above each one in the dominator tree]":
+        """ Cooper, Harvey and Kennedy's iterative algorithm. Block 0 is above itself, and blocks it
+            can't get to have None.
+        """
+        reachable = self.reachable()
+        order = [b for b in _reversePostorder(self.successors, [0]) if b in reachable]
+        rank = [None] * len(self.blocks)
+        for cnt, b in enumerate(order):
+            rank[b] = cnt
+        idom = [None] * len(self.blocks)
+        idom[0] = 0
+        # Blocks already walked past while working out the current block, so a join with thousands of
+        # predecessors doesn't walk the same chain of ifs once for each of them
+        marked = [0] * len(self.blocks)
+        stamp = 0
+        changed = True
+        while changed:
+            changed = False
+            for b in order[1:]:
+                stamp += 1
+                new = None
+                for p in self.predecessors[b]:
+                    if idom[p] is None:
+                        continue
+                    if new is None:
+                        new = p
+                        marked[p] = stamp
+                        continue
+                    # Walk both up the tree until they meet, or p reaches somewhere under new already
+                    while p != new:
+                        if rank[p] > rank[new]:
+                            marked[p] = stamp
+                            p = idom[p]
+                            if marked[p] == stamp:
+                                break
+                        else:
+                            new = idom[new]
+                            marked[new] = stamp
+                if idom[b] != new:
+                    idom[b] = new
+                    changed = True
+        return idom
+
+    def usesAndSets(self, b) -> "(variables block b reads before setting them, variables it sets)":
+        start, stop = self.blocks[b]
+        uses, sets = set(), set()
+        for i in reversed(self.program[start:stop]):
+            if isinstance(i, Label):
+                continue
+            var = _sets(i)
+            if var is not None:
+                uses.discard(var)
+                sets.add(var)
+            uses.update(_reads(i))
+        return uses, sets
+
+    def liveOut(self) -> "[the variables each block sets that might be read after it]":
+        """ Standard backwards liveness, iterated until nothing changes. A variable only matters here if
+            some block sets it and some block reads it before setting it, and while it's working those
+            are kept as ints with a bit for each one, since big programs can have thousands of them.
+            If it hasn't settled after MAX_LIVENESS_PASSES, every one of those is taken to be live.
+        """
+        usesAndSets = [self.usesAndSets(b) for b in range(len(self.blocks))]
+        variables = sorted(set().union(*(uses for uses, _ in usesAndSets)) & set().union(*(sets for _, sets in usesAndSets)))
+        index = {var: cnt for cnt, var in enumerate(variables)}
+        width = len(variables) // 8 + 1
+
+        def toBits(vars):
+            bits = bytearray(width)
+            for var in vars:
+                if var in index:
+                    bits[index[var] >> 3] |= 1 << (index[var] & 7)
+            return int.from_bytes(bits, 'little')
+
+        use = [toBits(uses) for uses, _ in usesAndSets]
+        keep = [~toBits(sets) for _, sets in usesAndSets]
+        predecessors = self.predecessors
+
+        liveIn = [0] * len(self.blocks)
+        liveOut = [0] * len(self.blocks)
+        # Liveness flows backwards, so go through the blocks in passes in reverse postorder of the reversed
+        # graph, starting from the end of the program, redoing the ones whose successors changed. Each
+        # block comes after everything it leads to except around loops, so most programs settle in a couple
+        # of passes. Loops nested inside each other's tests can need a pass for each level though, so
+        # deeply nested ones are given up on instead of taking time quadratic in their depth.
+        order = _reversePostorder(predecessors, [len(self.blocks) - 1])
+        dirty = [True] * len(self.blocks)
+        changed = True
+        passes = 0
+        while changed:
+            if passes == MAX_LIVENESS_PASSES:
+                return [{var for var in sets if var in index} for _, sets in usesAndSets]
+            passes += 1
+            changed = False
+            for b in order:
+                if not dirty[b]:
+                    continue
+                dirty[b] = False
+                out = 0
+                for s in self.successors[b]:
+                    out |= liveIn[s]
+                liveOut[b] = out
+                new = use[b] | (out & keep[b])
+                if new != liveIn[b]:
+                    liveIn[b] = new
+                    changed = True
+                    for p in predecessors[b]:
+                        dirty[p] = True
+
+        live = []
+        for b, (_, sets) in enumerate(usesAndSets):
+            bits = liveOut[b].to_bytes(width, 'little')
+            live.append({var for var in sets if var in index and bits[index[var] >> 3] >> (index[var] & 7) & 1})
+        return live
+
+def _graph(program):
+    """ The ControlFlowGraph of program, or None if it can't be worked out """
+    # Setting @counter jumps somewhere we can't know ahead of time
+    if any(_sets(i) == '@counter' for i in program if not isinstance(i, Label)):
+        return None
+    try:
+        return ControlFlowGraph(program)
+    except KeyError:
+        return None
+
+def removeDeadCode(program):
+    """ Takes out the blocks nothing can get to, like code after an end or an unconditional jump
+        that nothing jumps into, and instructions that only set a variable which nothing reads before
+        it's set again. Built-in variables (the ones starting with @) are never dead, since setting
+        them can do something, and so is anything that isn't in _pure.
+    """
+    graph = _graph(program)
+    if graph is None:
+        return None
+    reachable = graph.reachable()
+    # Only the variables each block sets are in these, but those are the only ones it looks up.
+    # Unreachable blocks can only lead to other unreachable blocks, so they don't change these for the rest.
+    liveOut = graph.liveOut()
+    kept = []
+    for b, (start, stop) in enumerate(graph.blocks):
+        if b not in reachable:
+            continue
+        live = liveOut[b]
+        block = []
+        for i in reversed(program[start:stop]):
+            if not isinstance(i, Label):
+                var = _sets(i)
+                if var is not None:
+                    if var not in live and not var.startswith('@'):
+                        continue
+                    live.discard(var)
+                live.update(_reads(i))
+            block.append(i)
+        kept += reversed(block)
+    return kept if len(kept) != len(program) else None
+
+
+################################### Constants ###################################
+# Numbers are doubles in Mindustry, like Python floats, so most ops give exactly the same answer here.
+# The ones that don't (trig, logs, noise, rand) aren't folded, and pow only is when the answer is a whole
+# number small enough to be exact. Bitwise ops work on the numbers cast to (Java) longs.
+_erNumber = re.compile(r'-?\d+(?:\.\d+)?$')
+_literals = {'true': 1.0, 'false': 0.0}
+
+# How much work foldConstants puts into placing phis, for each instruction in the program, before it takes
+# the variables that haven't been placed yet to never be known
+PHI_BUDGET = 16
+
+def _long(a) -> int:
+    return max(-2**63, min(2**63 - 1, int(a)))
+
+def _wrap(a) -> float:
+    """ An int overflowing like a long does """
+    return float((a + 2**63) % 2**64 - 2**63)
+
+def _pow(a, b):
+    if not (a.is_integer() and b.is_integer() and b >= 0):
+        return None
+    exact = int(a) ** int(b) if b < 64 or abs(a) <= 1 else None
+    return float(exact) if exact is not None and abs(exact) <= 2**53 else None
+
+# Two numbers are equal in Mindustry if they're this close
+_epsilon = 0.000001
+
+_foldable = {
+    'add':           lambda a, b: a + b,
+    'sub':           lambda a, b: a - b,
+    'mul':           lambda a, b: a * b,
+    'div':           lambda a, b: a / b if b else None,
+    'idiv':          lambda a, b: float(math.floor(a / b)) if b else None,
+    'mod':           lambda a, b: math.fmod(a, b) if b else None,
+    'pow':           _pow,
+    'equal':         lambda a, b: float(abs(a - b) < _epsilon),
+    'notEqual':      lambda a, b: float(abs(a - b) >= _epsilon),
+    'land':          lambda a, b: float(a != 0 and b != 0),
+    'lessThan':      lambda a, b: float(a < b),
+    'lessThanEq':    lambda a, b: float(a <= b),
+    'greaterThan':   lambda a, b: float(a > b),
+    'greaterThanEq': lambda a, b: float(a >= b),
+    'shl':           lambda a, b: _wrap(_long(a) << (_long(b) & 63)),
+    'shr':           lambda a, b: _wrap(_long(a) >> (_long(b) & 63)),
+    'or':            lambda a, b: _wrap(_long(a) | _long(b)),
+    'and':           lambda a, b: _wrap(_long(a) & _long(b)),
+    'xor':           lambda a, b: _wrap(_long(a) ^ _long(b)),
+    'not':           lambda a, b: _wrap(~_long(a)),
+    'max':           lambda a, b: max(a, b),
+    'min':           lambda a, b: min(a, b),
+    'abs':           lambda a, b: abs(a),
+    'floor':         lambda a, b: float(math.floor(a)),
+    'ceil':          lambda a, b: float(math.ceil(a)),
+    'sqrt':          lambda a, b: math.sqrt(a) if a >= 0 else None,
+}
+
+# The instructions that never set any variables. Any others that aren't in _pure might set any of their arguments.
+_setsNothing = {'jump', 'end', 'print', 'printflush', 'draw', 'drawflush', 'write', 'control'}
+
+@lru_cache(maxsize=4096)
+def _number(arg) -> "the number arg is, if it's a literal one":
+    if arg in _literals:
+        return _literals[arg]
+    return float(arg) if _erNumber.match(arg) else None
+
+def _value(arg, known) -> "the number arg is, or None if it isn't known":
+    return known[arg] if arg in known else _number(arg)
+
+def _format(value) -> "value as an mlog number, or None if it can't be written as one exactly":
+    if value is None or not math.isfinite(value):
+        return None
+    if value.is_integer() and abs(value) <= 2**53:
+        return str(int(value))
+    # Mindustry doesn't read exponents
+    text = repr(value)
+    return None if 'e' in text else text
+
+def _fillIn(args, known):
+    return [arg if arg not in known else _format(known[arg]) for arg in args]
+
+def _fold(i, known, rewrite=True) -> "i, with what's known about the variables filled in, or None to take it out":
+    """ Also updates known with whatever i sets. If rewrite isn't set, only known is worked out, and i is returned. """
+    if i.op == 'set' and len(i.args) == 2:
+        var, val = i.args
+        value = _value(val, known)
+        if value is not None and _format(value) is not None and not var.startswith('@'):
+            known[var] = value
+            return Instruction('set', var, _format(value)) if rewrite and val in known else i
+
+    elif i.op == 'op' and len(i.args) >= 3 and i.args[0] in _foldable:
+        operation, var, *operands = i.args
+        values = [_value(arg, known) for arg in operands]
+        if None not in values and not var.startswith('@'):
+            result = _format(_foldable[operation](values[0], values[1] if len(values) > 1 else 0.0))
+            if result is not None:
+                known[var] = float(result)
+                return Instruction('set', var, result) if rewrite else i
+        # Even if it can't be folded, some of the operands might be known
+        if rewrite and any(arg in known for arg in operands):
+            i = Instruction('op', operation, var, *_fillIn(operands, known))
+        known.pop(var, None)
+        return i
+
+    elif i.op == 'print' and len(i.args) == 1 and i.args[0] in known:
+        return Instruction('print', _format(known[i.args[0]])) if rewrite else i
+
+    elif i.op == 'jump' and len(i.args) == 4 and i.args[1] in _foldable:
+        if not rewrite:
+            return i
+        target, condition, *operands = i.args
+        values = [_value(arg, known) for arg in operands]
+        if None not in values:
+            return Instruction('jump', target, 'always') if _foldable[condition](*values) else None
+        if any(arg in known for arg in operands):
+            return Instruction('jump', target, condition, *_fillIn(operands, known))
+        return i
+
+    if i.op in _setsNothing:
+        return i
+    var = _sets(i)
+    for arg in ((var,) if var is not None else i.args):
+        known.pop(arg, None)
+    return i
+
+def _foldReads(i) -> "the variables _fold looks up the values of":
+    if (i.op == 'set' and len(i.args) == 2) or (i.op == 'print' and len(i.args) == 1):
+        args = i.args[-1:]
+    elif (i.op == 'op' and len(i.args) >= 3) or (i.op == 'jump' and len(i.args) == 4):
+        args = i.args[2:]
+    else:
+        return ()
+    return [arg for arg in args if _isVariable(arg)]
+
+def _foldSets(i) -> "the variables _fold might change what's known about":
+    if i.op in _setsNothing:
+        return ()
+    var = _sets(i)
+    return [arg for arg in ((var,) if var is not None else i.args) if _isVariable(arg)]
+
+def _isFoldableJump(i) -> bool:
+    return i.op == 'jump' and len(i.args) == 4 and i.args[1] in _foldable
+
+def _knowable(program) -> "{the variables that could ever hold a known number}":
+    """ The ones set somewhere to a literal number, or by a set or op _fold could work out if everything it
+        reads was known, and everything it reads could be known too. The rest are never known anywhere, so
+        foldConstants doesn't follow them.
+    """
+    waiting = []      # [[variable, how many of the variables it reads aren't knowable yet]]
+    readers = {}      # {variable: the indices in waiting of the sets that read it}
+    for i in program:
+        if isinstance(i, Label):
+            continue
+        if i.op == 'set' and len(i.args) == 2:
+            var, operands = i.args[0], i.args[1:]
+        elif i.op == 'op' and len(i.args) >= 3 and i.args[0] in _foldable:
+            var, operands = i.args[1], i.args[2:]
+        else:
+            continue
+        if var.startswith('@') or any(not _isVariable(arg) and _number(arg) is None for arg in operands):
+            continue
+        unknown = {arg for arg in operands if _isVariable(arg)}
+        for arg in unknown:
+            readers.setdefault(arg, []).append(len(waiting))
+        waiting.append([var, len(unknown)])
+
+    knowable = set()
+    todo = [var for var, unknown in waiting if not unknown]
+    while todo:
+        var = todo.pop()
+        if var in knowable:
+            continue
+        knowable.add(var)
+        for w in readers.get(var, ()):
+            waiting[w][1] -= 1
+            if not waiting[w][1]:
+                todo.append(waiting[w][0])
+    return knowable
+
+def _phiBlocks(graph, idom, sites, budget) -> "({variable: the blocks where different values of it can come together}, {the variables left out})":
+    """ Where SSA form would put a phi for each variable, given {variable: the blocks that set it}: the
+        iterated dominance frontiers of the blocks that set it. Nothing is ever known going into block 0,
+        so it's left out. Working out each variable's phis costs the frontiers it looks through and the
+        ways into the phis it puts in, and once the budget is spent, the variables that don't fit are left out.
+    """
+    # Cooper, Harvey and Kennedy's way of finding the frontiers. Going up from each predecessor stops at a
+    # block that already has this one, since everything above that does too.
+    frontiers = [[] for _ in graph.blocks]
+    for b in range(1, len(graph.blocks)):
+        predecessors = [p for p in graph.predecessors[b] if idom[p] is not None]
+        if idom[b] is None or len(predecessors) < 2:
+            continue
+        for runner in predecessors:
+            while runner != idom[b] and not (frontiers[runner] and frontiers[runner][-1] == b):
+                frontiers[runner].append(b)
+                runner = idom[runner]
+
+    phis = {}
+    leftOut = set()
+    for var, blocks in sites.items():
+        placed = set()
+        todo = list(blocks)
+        while todo and budget >= 0:
+            frontier = frontiers[todo.pop()]
+            budget -= len(frontier)
+            for f in frontier:
+                if f not in placed:
+                    placed.add(f)
+                    budget -= len(graph.predecessors[f])
+                    if f not in blocks:
+                        todo.append(f)
+        if budget < 0:
+            leftOut.add(var)
+        elif placed:
+            phis[var] = placed
+    return phis, leftOut
+
+def foldConstants(program):
+    """ Works out which variables hold a known number at each point in the program (the ones set to
+        the same number on every way there), and fills them in. Ops on only known numbers become a set
+        (which removeDeadCode takes out if nothing needs it anymore), and jumps on a known condition
+        become unconditional, or are taken out.
+        It's sparse conditional constant propagation: the program is put in SSA form (every place a
+        variable is set, plus a phi wherever different ones can come together, is a definition with
+        its own value), so a value only goes where it's read. Jumps on known conditions are followed
+        as they're found, so code that can only be reached the way they don't go doesn't make anything
+        less known, and phis only count the ways into them that can be taken.
+    """
+    graph = _graph(program)
+    if graph is None:
+        return None
+    idom = graph.dominators()
+    blockOf = [0] * len(program)
+    for b, (start, stop) in enumerate(graph.blocks):
+        blockOf[start:stop] = [b] * (stop - start)
+
+    tracked = _knowable(program)
+    sites = {}
+    for b, (start, stop) in enumerate(graph.blocks):
+        if idom[b] is not None:
+            for i in program[start:stop]:
+                if not isinstance(i, Label):
+                    for var in _foldSets(i):
+                        if var in tracked:
+                            sites.setdefault(var, set()).add(b)
+
+    # Counters in loops nested thousands deep can each need a phi at nearly every loop
+    placed, leftOut = _phiBlocks(graph, idom, sites, PHI_BUDGET * len(program))
+    tracked -= leftOut
+
+    # Definitions are numbered. 0 is what everything is going into block 0, which is never known.
+    # users are the instructions (by index) and phis (as (phi, predecessor)) that read each one.
+    users = [[]]
+    def define():
+        users.append([])
+        return len(users) - 1
+
+    # {block: {variable: phi}}, {phi: {predecessor: the definition coming from it}}, and {phi: its block}
+    # Each phi also keeps the value coming from each way in that can be taken, and a count of each value,
+    # so taking one more way in doesn't look at all the others.
+    phis = [{} for _ in graph.blocks]
+    operands = {}
+    phiBlock = {}
+    phiInputs = {}
+    phiCounts = {}
+    for var, blocks in placed.items():
+        for b in blocks:
+            phis[b][var] = phi = define()
+            operands[phi] = {}
+            phiBlock[phi] = b
+            phiInputs[phi] = {}
+            phiCounts[phi] = {}
+
+    # Rename: walk down the dominator tree, keeping the definition of each variable that's in effect
+    reads = {}     # {instruction index: {variable: definition}}
+    sets = {}      # {instruction index: [(variable, definition)]}
+    children = [[] for _ in graph.blocks]
+    for b in range(1, len(graph.blocks)):
+        if idom[b] is not None:
+            children[idom[b]].append(b)
+    current = {}
+    stack = [(0, False)]
+    while stack:
+        b, leaving = stack.pop()
+        start, stop = graph.blocks[b]
+        if leaving:
+            for cnt in range(stop - 1, start - 1, -1):
+                for var, _ in sets.get(cnt, ()):
+                    current[var].pop()
+            for var in phis[b]:
+                current[var].pop()
+            continue
+
+        for var, phi in phis[b].items():
+            current.setdefault(var, []).append(phi)
+        for cnt in range(start, stop):
+            i = program[cnt]
+            if isinstance(i, Label):
+                continue
+            found = {var: current[var][-1] if current.get(var) else 0 for var in _foldReads(i) if var in tracked}
+            if found:
+                reads[cnt] = found
+                for d in found.values():
+                    users[d].append(cnt)
+            setting = [var for var in _foldSets(i) if var in tracked]
+            if setting:
+                sets[cnt] = [(var, define()) for var in setting]
+                for var, d in sets[cnt]:
+                    current.setdefault(var, []).append(d)
+        for s in dict.fromkeys(graph.successors[b]):
+            for var, phi in phis[s].items():
+                d = current[var][-1] if current.get(var) else 0
+                operands[phi][b] = d
+                users[d].append((phi, b))
+
+        stack.append((b, True))
+        stack += [(child, False) for child in children[b]]
+
+    # Propagate. values has a number, or None if it isn't known, for each definition worked out so far.
+    values = {0: None}
+    unset = object()
+    changedDefs = []
+
+    def setValue(d, value):
+        old = values.get(d, unset)
+        if old is unset:
+            values[d] = value
+        elif old is None or old == value:
+            return
+        else:
+            values[d] = None
+        changedDefs.append(d)
+
+    def updatePhi(phi, p):
+        value = values.get(operands[phi][p], unset)
+        inputs = phiInputs[phi]
+        counts = phiCounts[phi]
+        old = inputs.get(p, unset)
+        if value is unset or value == old:
+            return
+        if old is not unset:
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+        inputs[p] = value
+        counts[value] = counts.get(value, 0) + 1
+        setValue(phi, None if None in counts or len(counts) > 1 else value)
+
+    taken = set()
+    newEdges = []
+    def take(b, successors):
+        for s in successors:
+            if (b, s) not in taken:
+                taken.add((b, s))
+                newEdges.append((b, s))
+
+    def evaluate(cnt):
+        i = program[cnt]
+        known = {}
+        for var, d in reads.get(cnt, {}).items():
+            value = values.get(d, unset)
+            # Wait until everything it reads has been worked out
+            if value is unset:
+                return
+            if value is not None:
+                known[var] = value
+        b = blockOf[cnt]
+        successors = graph.successors[b]
+        if _isFoldableJump(i):
+            compared = [_value(arg, known) for arg in i.args[2:]]
+            # The jump is always the last thing in a block, and its target is the first successor
+            if None not in compared:
+                successors = successors[:1] if _foldable[i.args[1]](*compared) else successors[1:]
+            take(b, successors)
+            return
+        _fold(i, known, rewrite=False)
+        for var, d in sets.get(cnt, ()):
+            setValue(d, known.get(var))
+
+    visited = set()
+    def visit(b):
+        visited.add(b)
+        start, stop = graph.blocks[b]
+        last = None
+        for cnt in range(start, stop):
+            if not isinstance(program[cnt], Label):
+                evaluate(cnt)
+                last = program[cnt]
+        if last is None or not _isFoldableJump(last):
+            take(b, graph.successors[b])
+
+    visit(0)
+    while newEdges or changedDefs:
+        if newEdges:
+            p, b = newEdges.pop()
+            for phi in phis[b].values():
+                updatePhi(phi, p)
+            if b not in visited:
+                visit(b)
+            continue
+        for user in users[changedDefs.pop()]:
+            if type(user) is tuple:
+                phi, p = user
+                if (p, phiBlock[phi]) in taken:
+                    updatePhi(phi, p)
+            elif blockOf[user] in visited:
+                evaluate(user)
+
+    folded = []
+    changed = False
+    for b, (start, stop) in enumerate(graph.blocks):
+        # Blocks that were never looked at can't be reached, and removeDeadCode takes them out
+        if b not in visited:
+            folded += program[start:stop]
+            continue
+        for cnt in range(start, stop):
+            i = program[cnt]
+            if isinstance(i, Label):
+                folded.append(i)
+                continue
+            known = {var: values[d] for var, d in reads.get(cnt, {}).items() if values.get(d) is not None}
+            new = _fold(i, known)
+            if new is not None:
+                folded.append(new)
+            changed = changed or new is None or new != i
+    return folded if changed else None
+
+
+# The rules -O1 runs, in the order they're tried
+PEEPHOLE_RULES = (invertJumpOverJump, fuseCompareAndJump, threadJumps, removeNoopJumps, removeUnusedLabels)
+DEAD_CODE_RULES = (foldConstants, removeDeadCode)
+
+# What each optimization level does. Anything higher than the highest level gets the highest level, and
+# anything lower than 0 gets 0.
+levels = {
+    0: (),
+    1: PEEPHOLE_RULES + DEAD_CODE_RULES,
+}
+
+# The rules that have to see the whole program to be right, since they look at how variables are used,
+# or where the program goes after its last instruction
+wholeProgramRules = {fuseCompareAndJump, foldConstants, removeDeadCode}
+
+
+def peephole(program, rules=PEEPHOLE_RULES) -> "[Instruction]":
+    """ Runs rules over program until none of them can change it any further """
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            new = rule(program)
+            if new is not None:
+                program = new
+                changed = True
+    return program
+
+def optimize(program, level=1, partial=False) -> "[Instruction]":
+    """ Optimizes a program from generate() at the given level (0 doesn't do anything).
+        If program is only part of one (like a single statement, for --stream), set partial, and
+        the rules in wholeProgramRules are skipped.
+        Programs with jumps that still count instructions (to somewhere outside of them) are left
+        alone, since taking out instructions would change where those jumps go.
+    """
+    rules = [i for i in levels[max(0, min(level, max(levels)))] if not (partial and i in wholeProgramRules)]
+    if not rules or any(i.op == 'jump' and i.args and mlog.isOffset(i.args[0]) for i in program):
+        return program
+    return peephole(program, rules)